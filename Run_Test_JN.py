@@ -1,5 +1,6 @@
 # Change to the directory where you saved the files
 %cd {save_dir}
 
-# Run the test script in Jupyter Notebook
-!python test_church_algorithm.py
+# Run the tests in Jupyter Notebook, spread across all cores by pytest-xdist
+# (needs pytest and pytest-xdist installed once, e.g. pip install pytest pytest-xdist)
+!python -m pytest -n auto test_church_algorithm.py
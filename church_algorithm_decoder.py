@@ -4,10 +4,22 @@
 import csv
 import zlib
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
 
 # Mapping bases back to bits
 BASE_TO_BIT = {'A': '0', 'C': '0', 'G': '1', 'T': '1'}
 
+# 256-entry translation table equivalent to BASE_TO_BIT, used with bytes.translate
+# so the per-base lookup runs in C instead of a Python loop
+_B2B = bytes.maketrans(b'ACGT', b'0011')
+
+# Mask selecting the 96-bit data payload
+_DATA_MASK = (1 << 96) - 1
+
+# Number of oligos per shard when decoding in worker processes (~1 MiB of CSV)
+SHARD_SIZE = 5000
+
 # Default primer sequences
 DEFAULT_FORWARD_PRIMER = "CTACACGACGCTCTTCCGATCT"
 DEFAULT_REVERSE_PRIMER = "AGATCGGAAGAGCGGTTCAGCA"
@@ -17,34 +29,38 @@ def decode_dna_to_bits(dna_sequence):
     Decode a DNA sequence back into a bitstring.
     
     Args:
-        dna_sequence (str): Input DNA sequence.
+        dna_sequence (str or bytes): Input DNA sequence.
         
     Returns:
-        str: Decoded bitstring.
+        str: Decoded bitstring of '0' and '1' characters.
+        
+    Raises:
+        ValueError: If the sequence contains a base other than A, C, G or T.
     """
-    return ''.join(BASE_TO_BIT[base] for base in dna_sequence)
+    if isinstance(dna_sequence, str):
+        dna_sequence = dna_sequence.encode('ascii')
+    bits = dna_sequence.translate(_B2B)
+    
+    # Anything left after deleting '0'/'1' was not a valid base
+    if bits.translate(None, b'01'):
+        raise ValueError("DNA sequence contains invalid bases. Only 'A', 'C', 'G' and 'T' are allowed.")
+    
+    return bits.decode('ascii')
 
-def verify_crc32_checksum(data_bits, checksum_bits):
+def verify_crc32_checksum(data_bytes, checksum):
     """
     Verify that the CRC32 checksum of the data matches the provided checksum.
     
     Args:
-        data_bits (str): Data bits to verify.
-        checksum_bits (str): Expected CRC32 checksum as bits.
+        data_bytes (bytes): Data payload to verify.
+        checksum (int): Expected CRC32 checksum.
         
     Returns:
         bool: True if checksum matches, False otherwise.
     """
-    # Convert data bits to bytes
-    byte_data = int(data_bits, 2).to_bytes((len(data_bits) + 7) // 8, byteorder='big')
-    
-    # Calculate checksum
-    calculated_checksum = zlib.crc32(byte_data)
-    calculated_checksum_bits = f"{calculated_checksum:032b}"
-    
-    return calculated_checksum_bits == checksum_bits
+    return zlib.crc32(data_bytes) == checksum
 
-def extract_oligo_parts(oligo, forward_primer=None, reverse_primer=None):
+def extract_oligo_parts(oligo, forward_primer=None, reverse_primer=None, layout_cache=None):
     """
     Extract address, data, and CRC32 parts from an oligo.
     
@@ -52,31 +68,146 @@ def extract_oligo_parts(oligo, forward_primer=None, reverse_primer=None):
         oligo (str): Full DNA oligo sequence.
         forward_primer (str, optional): Forward primer sequence.
         reverse_primer (str, optional): Reverse primer sequence.
+        layout_cache (dict, optional): Cache of primer layouts. When given, the primer
+            positions of the first oligo of a given length whose primers are all found
+            are reused for later oligos of the same length without checking the primers again.
         
     Returns:
         tuple: (address_dna, data_dna, crc32_dna)
     """
-    # If primers are provided, remove them
-    core_sequence = oligo
+    # Fast path: reuse the layout of a previous oligo with the same length and primers
+    if layout_cache is not None:
+        key = (len(oligo), forward_primer, reverse_primer)
+        layout = layout_cache.get(key)
+        if layout is not None:
+            start, end = layout
+            return oligo[start:start+19], oligo[start+19:start+19+96], oligo[start+19+96:end]
+    
+    # If primers are provided, find the core sequence between them
+    start = 0
+    end = len(oligo)
     
     if forward_primer and oligo.startswith(forward_primer):
-        core_sequence = core_sequence[len(forward_primer):]
+        start = len(forward_primer)
     
-    if reverse_primer and core_sequence.endswith(reverse_primer):
-        core_sequence = core_sequence[:-len(reverse_primer)]
+    if reverse_primer and oligo.endswith(reverse_primer, start):
+        end -= len(reverse_primer)
     
     # Extract parts based on known positions
     # Address: 19 nt, Data: 96 nt, CRC32: rest
-    if len(core_sequence) >= 19 + 96:
-        address_dna = core_sequence[:19]
-        data_dna = core_sequence[19:19+96]
-        crc32_dna = core_sequence[19+96:]
-        return address_dna, data_dna, crc32_dna
+    if end - start >= 19 + 96:
+        # Only a read whose given primers both matched fixes the layout; caching the
+        # offsets of a read with a damaged primer would misalign every later read
+        if (layout_cache is not None
+                and (not forward_primer or start == len(forward_primer))
+                and (not reverse_primer or end == len(oligo) - len(reverse_primer))):
+            layout_cache[key] = (start, end)
+        return oligo[start:start+19], oligo[start+19:start+19+96], oligo[start+19+96:end]
     
     # If the sequence is too short, return None
     return None, None, None
 
-def decode_oligos_from_csv(csv_file_path, forward_primer=None, reverse_primer=None, output_file=None):
+def decode_oligo_batch(records, forward_primer, reverse_primer, block_info, errors, verify_crc=True):
+    """
+    Decode a batch of oligos into data payloads keyed by (block_index, address).
+    
+    The address, data and CRC32 regions of all oligos are concatenated into a
+    single buffer and translated to bits in one pass, so the per-oligo work is
+    reduced to slicing fixed offsets out of that buffer.
+    
+    Args:
+        records (list): List of tuples (row_num, block_index, oligo).
+        forward_primer (str, optional): Forward primer sequence.
+        reverse_primer (str, optional): Reverse primer sequence.
+        block_info (dict): Block information dict; its CRC statistics are updated.
+        errors (list): List that error messages are appended to.
+        verify_crc (bool, optional): Whether to verify CRC32 checksums. When False the
+            checksum region is not decoded at all and no CRC statistics are collected.
+    
+    Returns:
+        dict: Dictionary mapping (block_index, address) to the 12-byte decoded payload
+    """
+    decoded_blocks = {}
+    
+    # Collect the address + data (+ CRC32) region of every oligo
+    cores = []
+    layout = []  # (row_num, block_index, offset, has_crc) for each core
+    offset = 0
+    layout_cache = {}
+    for row_num, block_index, oligo in records:
+        address_dna, data_dna, crc32_dna = extract_oligo_parts(oligo, forward_primer, reverse_primer, layout_cache)
+        
+        if address_dna is None or data_dna is None:
+            errors.append(f"Row {row_num}: Failed to extract parts from oligo")
+            continue
+        
+        has_crc = verify_crc and len(crc32_dna) >= 32
+        core = address_dna + data_dna + crc32_dna[:32] if has_crc else address_dna + data_dna
+        cores.append(core)
+        layout.append((row_num, block_index, offset, has_crc))
+        offset += len(core)
+    
+    if not cores:
+        return decoded_blocks
+    
+    # Decode DNA to bits for the whole batch at once
+    # Non-ASCII characters become '?' so offsets stay aligned and the row is rejected below
+    bits = ''.join(cores).encode('ascii', 'replace').translate(_B2B)
+    check_rows = bool(bits.translate(None, b'01'))
+    
+    for row_num, block_index, start, has_crc in layout:
+        end = start + (19 + 96 + 32 if has_crc else 19 + 96)
+        row_bits = bits[start:end]
+        
+        # Only inspect individual rows when the batch contains invalid bases
+        if check_rows and row_bits.strip(b'01'):
+            errors.append(f"Row {row_num}: Error processing - DNA sequence contains invalid bases")
+            continue
+        
+        # Parse the whole row once, straight from the translated bytes, and split it
+        # into fields with shifts and masks
+        # Row layout: address (19 bits) | data (96 bits) | CRC32 (32 bits, optional)
+        row_value = int(row_bits, 2)
+        crc_width = 32 if has_crc else 0
+        address = row_value >> (96 + crc_width)
+        data_bytes = ((row_value >> crc_width) & _DATA_MASK).to_bytes(12, byteorder='big')
+        
+        # Handle CRC32 checksum if available
+        if has_crc:
+            if verify_crc32_checksum(data_bytes, row_value & 0xFFFFFFFF):
+                block_info["crc_stats"]["valid"] += 1
+            else:
+                block_info["crc_stats"]["invalid"] += 1
+                errors.append(f"Row {row_num}: CRC32 checksum verification failed")
+                continue  # Skip this oligo if CRC is invalid
+        elif verify_crc:
+            block_info["crc_stats"]["missing"] += 1
+        
+        # Store with block information
+        decoded_blocks[(block_index, address)] = data_bytes
+    
+    return decoded_blocks
+
+def decode_oligo_shard(records, forward_primer, reverse_primer, verify_crc=True):
+    """
+    Decode a shard of oligos independently, e.g. in a worker process.
+    
+    Args:
+        records (list): List of tuples (row_num, block_index, oligo).
+        forward_primer (str, optional): Forward primer sequence.
+        reverse_primer (str, optional): Reverse primer sequence.
+        verify_crc (bool, optional): Whether to verify CRC32 checksums.
+    
+    Returns:
+        tuple: (Decoded blocks dict, CRC statistics dict, List of error messages)
+    """
+    shard_info = {"crc_stats": {"valid": 0, "invalid": 0, "missing": 0}}
+    errors = []
+    decoded_blocks = decode_oligo_batch(records, forward_primer, reverse_primer, shard_info, errors, verify_crc)
+    return decoded_blocks, shard_info["crc_stats"], errors
+
+def decode_oligos_from_csv(csv_file_path, forward_primer=None, reverse_primer=None, output_file=None, max_workers=1,
+                           verify_crc=True, output_digest=False):
     """
     Decode DNA oligos from a CSV file back into the original data.
     
@@ -85,13 +216,18 @@ def decode_oligos_from_csv(csv_file_path, forward_primer=None, reverse_primer=No
         forward_primer (str, optional): Forward primer sequence.
         reverse_primer (str, optional): Reverse primer sequence.
         output_file (str, optional): Path to save the decoded binary file.
+        max_workers (int, optional): Number of worker processes used to decode shards of
+            oligos in parallel. None uses all CPUs; the default of 1 decodes in this process.
+        verify_crc (bool, optional): Whether to verify CRC32 checksums. Set to False only
+            for trusted input, e.g. a same-process round-trip.
+        output_digest (bool, optional): Whether to store the CRC32 hex digest of the data
+            written to output_file in block_info["output_digest"], computed from memory.
         
     Returns:
         tuple: (Decoded blocks dict, Block information dict)
-            - decoded_blocks: Dictionary mapping (block_index, address) to decoded data bits
+            - decoded_blocks: Dictionary mapping (block_index, address) to the 12-byte decoded payload
             - block_info: Dictionary with block size and count information
     """
-    decoded_blocks = {}
     errors = []
     block_info = {
         "block_size_bytes": 0,      # Maximum block size
@@ -102,7 +238,8 @@ def decode_oligos_from_csv(csv_file_path, forward_primer=None, reverse_primer=No
     }
     
     # Read oligos from CSV
-    with open(csv_file_path, 'r', newline='') as csvfile:
+    # A 4 MiB read buffer lets the C csv tokenizer work through large files in few reads
+    with open(csv_file_path, 'r', newline='', buffering=1 << 22) as csvfile:
         reader = csv.reader(csvfile)
         header = next(reader)  # Skip header row
         
@@ -117,6 +254,8 @@ def decode_oligos_from_csv(csv_file_path, forward_primer=None, reverse_primer=No
             raise ValueError("CSV file does not contain a 'DNA Oligo' column")
         
         block_indices = set()
+        records = []
+        meta_done = False
         
         for row_num, row in enumerate(reader, 2):  # Start at row 2 (accounting for header)
             try:
@@ -126,49 +265,28 @@ def decode_oligos_from_csv(csv_file_path, forward_primer=None, reverse_primer=No
                 block_index = int(row[block_idx_col]) if block_idx_col != -1 and row[block_idx_col] else 0
                 block_indices.add(block_index)
                 
-                # Get block size if available
-                if block_size_col != -1 and row[block_size_col]:
-                    block_info["block_size_bytes"] = int(row[block_size_col])
+                # Block size and total file size are the same on every row,
+                # so stop parsing them once both have been found
+                if not meta_done:
+                    # Get block size if available
+                    if block_size_col != -1 and row[block_size_col]:
+                        block_info["block_size_bytes"] = int(row[block_size_col])
+                    
+                    # Get total file size if available
+                    if total_file_size_col != -1 and row[total_file_size_col]:
+                        block_info["total_file_size"] = int(row[total_file_size_col])
+                    
+                    meta_done = ((block_size_col == -1 or block_info["block_size_bytes"] > 0) and
+                                 (total_file_size_col == -1 or block_info["total_file_size"] > 0))
                 
-                # Get actual block size if available
-                if actual_block_size_col != -1 and row[actual_block_size_col]:
+                # Get actual block size if available (only needed once per block)
+                if (actual_block_size_col != -1 and block_index not in block_info["actual_block_sizes"]
+                        and row[actual_block_size_col]):
                     actual_block_size = int(row[actual_block_size_col])
                     block_info["actual_block_sizes"][block_index] = actual_block_size
                 
-                # Get total file size if available
-                if total_file_size_col != -1 and row[total_file_size_col]:
-                    block_info["total_file_size"] = int(row[total_file_size_col])
-                
-                # Extract parts from the oligo
-                address_dna, data_dna, crc32_dna = extract_oligo_parts(oligo, forward_primer, reverse_primer)
-                
-                if address_dna is None or data_dna is None:
-                    errors.append(f"Row {row_num}: Failed to extract parts from oligo")
-                    continue
-                
-                # Decode DNA to bits
-                address_bits = decode_dna_to_bits(address_dna)
-                data_bits = decode_dna_to_bits(data_dna)
-                
-                # Handle CRC32 checksum if available
-                crc_valid = False
-                if crc32_dna and len(crc32_dna) >= 32:
-                    crc32_bits = decode_dna_to_bits(crc32_dna[:32])
-                    crc_valid = verify_crc32_checksum(data_bits, crc32_bits)
-                    if crc_valid:
-                        block_info["crc_stats"]["valid"] += 1
-                    else:
-                        block_info["crc_stats"]["invalid"] += 1
-                        errors.append(f"Row {row_num}: CRC32 checksum verification failed")
-                        continue  # Skip this oligo if CRC is invalid
-                else:
-                    block_info["crc_stats"]["missing"] += 1
-                
-                # Convert address to integer for sorting
-                address = int(address_bits, 2)
-                
-                # Store with block information
-                decoded_blocks[(block_index, address)] = data_bits
+                # Defer the actual decoding so the whole file is handled as one batch
+                records.append((row_num, block_index, oligo))
                 
             except Exception as e:
                 errors.append(f"Row {row_num}: Error processing - {str(e)}")
@@ -176,6 +294,21 @@ def decode_oligos_from_csv(csv_file_path, forward_primer=None, reverse_primer=No
         # Update block count
         block_info["block_count"] = len(block_indices)
     
+    # Decode all oligos in one batch, or shard them across worker processes
+    if max_workers != 1 and len(records) > SHARD_SIZE:
+        shards = [records[i:i + SHARD_SIZE] for i in range(0, len(records), SHARD_SIZE)]
+        decoded_blocks = {}
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # Results come back in shard order, so later rows still win on duplicate keys
+            for shard_blocks, crc_stats, shard_errors in executor.map(
+                    decode_oligo_shard, shards, repeat(forward_primer), repeat(reverse_primer), repeat(verify_crc)):
+                decoded_blocks.update(shard_blocks)
+                for key, count in crc_stats.items():
+                    block_info["crc_stats"][key] += count
+                errors.extend(shard_errors)
+    else:
+        decoded_blocks = decode_oligo_batch(records, forward_primer, reverse_primer, block_info, errors, verify_crc)
+    
     # If there were errors, report them
     if errors:
         print(f"Encountered {len(errors)} errors during decoding:")
@@ -186,28 +319,36 @@ def decode_oligos_from_csv(csv_file_path, forward_primer=None, reverse_primer=No
     
     # Write decoded data to file if specified
     if output_file and decoded_blocks:
-        # Sort by block index and then by address within each block
-        sorted_keys = sorted(decoded_blocks.keys())
-        
-        # Concatenate all data bits in the correct order
-        reconstructed_bitstream = ""
-        for key in sorted_keys:
-            reconstructed_bitstream += decoded_blocks[key]
+        block_size = block_info["block_size_bytes"]
+        total_size = block_info["total_file_size"]
         
-        # If we know the total file size, trim the reconstructed bitstream
-        if block_info["total_file_size"] > 0:
-            # Convert file size to bits
-            total_file_bits = block_info["total_file_size"] * 8
-            reconstructed_bitstream = reconstructed_bitstream[:total_file_bits]
+        if block_size > 0 and total_size > 0:
+            # With the block layout known, every payload has a fixed position in the file,
+            # so write it straight into a preallocated buffer instead of sorting the keys
+            # Payload padding past the end of a block is dropped; missing oligos stay zero-filled
+            byte_data = bytearray(total_size)
+            actual_block_sizes = block_info["actual_block_sizes"]
+            for (block_index, address), payload in decoded_blocks.items():
+                block_start = block_index * block_size
+                block_end = min(block_start + actual_block_sizes.get(block_index, block_size), total_size)
+                start = block_start + (address - 1) * 12
+                end = min(start + 12, block_end)
+                if block_start <= start < end:
+                    byte_data[start:end] = payload[:end - start]
+        else:
+            # Sort by block index and then by address within each block
+            sorted_keys = sorted(decoded_blocks.keys())
+            
+            # Concatenate all payloads in the correct order, trimming to the
+            # total file size if we know it
+            byte_data = b''.join(decoded_blocks[key] for key in sorted_keys)[:total_size or None]
+        byte_length = len(byte_data)
         
-        # Convert bitstream to bytes
-        bit_length = len(reconstructed_bitstream)
-        byte_length = bit_length // 8
+        # Hash the buffer while it is still in memory rather than re-reading the file
+        if output_digest:
+            block_info["output_digest"] = f"{zlib.crc32(byte_data):08x}"
         
-        # Only process complete bytes
         if byte_length > 0:
-            byte_data = int(reconstructed_bitstream[:byte_length*8], 2).to_bytes(byte_length, byteorder='big')
-            
             with open(output_file, 'wb') as f:
                 f.write(byte_data)
             
@@ -215,7 +356,8 @@ def decode_oligos_from_csv(csv_file_path, forward_primer=None, reverse_primer=No
     
     return decoded_blocks, block_info
 
-def decode_oligos_from_fastq(fastq_file, forward_primer=None, reverse_primer=None, output_file=None):
+def decode_oligos_from_fastq(fastq_file, forward_primer=None, reverse_primer=None, output_file=None, verify_crc=True,
+                             output_digest=False):
     """
     Basic decoder for DNA oligos from a FASTQ file - no error correction.
     This is a simplified version that processes each read independently.
@@ -227,12 +369,14 @@ def decode_oligos_from_fastq(fastq_file, forward_primer=None, reverse_primer=Non
         forward_primer (str, optional): Forward primer sequence.
         reverse_primer (str, optional): Reverse primer sequence.
         output_file (str, optional): Path to save the decoded binary file.
+        verify_crc (bool, optional): Whether to verify CRC32 checksums.
+        output_digest (bool, optional): Whether to store the CRC32 hex digest of the data
+            written to output_file in block_info["output_digest"], computed from memory.
         
     Returns:
         tuple: (Decoded blocks dict, Block information dict)
     """
     # Initialize data structures
-    decoded_blocks = {}
     block_info = {
         "block_size_bytes": 0,
         "block_count": 0,
@@ -242,53 +386,17 @@ def decode_oligos_from_fastq(fastq_file, forward_primer=None, reverse_primer=Non
     }
     
     # Read sequences from FASTQ file
-    sequences = []
-    with open(fastq_file, 'r') as f:
-        line_count = 0
-        for line in f:
-            line_count += 1
-            if line_count % 4 == 2:  # FASTQ format: every 4th line is sequence
-                sequences.append(line.strip())
+    # FASTQ format: every 4th line is sequence; islice streams just those lines in C,
+    # so headers and qualities are never held in memory
+    with open(fastq_file, 'r', encoding='ascii', errors='replace') as f:
+        sequences = [line.rstrip() for line in islice(f, 1, None, 4)]
     
     print(f"Read {len(sequences)} sequences from {fastq_file}")
     
-    # Process each sequence independently
-    for seq in sequences:
-        try:
-            # Extract parts from the sequence
-            address_dna, data_dna, crc32_dna = extract_oligo_parts(seq, forward_primer, reverse_primer)
-            
-            if address_dna is None or data_dna is None:
-                continue
-            
-            # Decode DNA to bits
-            address_bits = decode_dna_to_bits(address_dna)
-            data_bits = decode_dna_to_bits(data_dna)
-            
-            # Check CRC32 if available
-            crc_valid = False
-            if crc32_dna and len(crc32_dna) >= 32:
-                crc32_bits = decode_dna_to_bits(crc32_dna[:32])
-                crc_valid = verify_crc32_checksum(data_bits, crc32_bits)
-                if crc_valid:
-                    block_info["crc_stats"]["valid"] += 1
-                else:
-                    block_info["crc_stats"]["invalid"] += 1
-                    continue  # Skip if CRC is invalid
-            else:
-                block_info["crc_stats"]["missing"] += 1
-            
-            # Convert address to integer and use default block 0
-            address = int(address_bits, 2)
-            block_index = 0  # Default block
-            
-            # Store data bits
-            key = (block_index, address)
-            decoded_blocks[key] = data_bits
-            
-        except Exception:
-            # Skip sequences that can't be processed
-            continue
+    # Decode all reads in one batch, using the default block 0 for every read
+    # Reads that can't be processed are skipped, so their errors are discarded
+    records = [(read_num, 0, seq) for read_num, seq in enumerate(sequences, 1)]
+    decoded_blocks = decode_oligo_batch(records, forward_primer, reverse_primer, block_info, [], verify_crc)
     
     # Update block count and file size
     block_indices = set(block for block, _ in decoded_blocks.keys())
@@ -296,26 +404,22 @@ def decode_oligos_from_fastq(fastq_file, forward_primer=None, reverse_primer=Non
     
     if decoded_blocks:
         # Estimate total file size from decoded blocks
-        block_info["total_file_size"] = sum(len(bits) for bits in decoded_blocks.values()) // 8
+        block_info["total_file_size"] = sum(len(payload) for payload in decoded_blocks.values())
     
     # Write decoded data to file if specified
     if output_file and decoded_blocks:
         # Sort by block index and then by address within each block
         sorted_keys = sorted(decoded_blocks.keys())
         
-        # Concatenate all data bits in the correct order
-        reconstructed_bitstream = ""
-        for key in sorted_keys:
-            reconstructed_bitstream += decoded_blocks[key]
+        # Concatenate all payloads in the correct order
+        byte_data = b''.join(decoded_blocks[key] for key in sorted_keys)
+        byte_length = len(byte_data)
         
-        # Convert bitstream to bytes
-        bit_length = len(reconstructed_bitstream)
-        byte_length = bit_length // 8
+        # Hash the buffer while it is still in memory rather than re-reading the file
+        if output_digest:
+            block_info["output_digest"] = f"{zlib.crc32(byte_data):08x}"
         
-        # Only process complete bytes
         if byte_length > 0:
-            byte_data = int(reconstructed_bitstream[:byte_length*8], 2).to_bytes(byte_length, byteorder='big')
-            
             with open(output_file, 'wb') as f:
                 f.write(byte_data)
             
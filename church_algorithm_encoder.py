@@ -5,6 +5,9 @@ import csv
 import zlib  # For CRC32 checksum
 import os    # For checking file size
 import random
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
 # Mapping for bits to bases (with synonyms)
 BIT_TO_BASE = {'0': ['A', 'C'], '1': ['G', 'T']}
@@ -16,38 +19,105 @@ DEFAULT_REVERSE_PRIMER = "AGATCGGAAGAGCGGTTCAGCA"
 # Avoid homopolymer runs of 4 bases
 HOMOPOLYMER_LIMIT = 3
 
-def avoid_homopolymer(last_bases, base):
-    """Ensure no homopolymer runs of 4 bases."""
-    if len(last_bases) >= HOMOPOLYMER_LIMIT and all(b == base for b in last_bases[-HOMOPOLYMER_LIMIT:]):
-        synonyms = {'A': 'C', 'C': 'A', 'G': 'T', 'T': 'G'}
-        return synonyms[base]
+# Synonym used to break a homopolymer run without changing the encoded bit
+SYNONYMS = {'A': 'C', 'C': 'A', 'G': 'T', 'T': 'G'}
+
+def avoid_homopolymer(state, base):
+    """
+    Ensure no homopolymer runs of 4 bases.
+    
+    Args:
+        state (tuple): (last_base, run_len) describing the run at the end of the sequence.
+        base (str): Candidate base.
+        
+    Returns:
+        str: The candidate base, or its synonym if it would extend the run past the limit.
+    """
+    if base == state[0] and state[1] >= HOMOPOLYMER_LIMIT:
+        return SYNONYMS[base]
     return base
 
-def encode_bits_to_dna(bits, last_bases):
-    """Convert a sequence of bits into a DNA sequence."""
-    dna_seq = ""
-    for bit in bits:
-        base = random.choice(BIT_TO_BASE[bit])  # Randomly choose between synonyms
-        base = avoid_homopolymer(last_bases, base)  # Avoid homopolymer runs
-        last_bases.append(base)
-        if len(last_bases) > HOMOPOLYMER_LIMIT:
-            last_bases.pop(0)
-        dna_seq += base
-    return dna_seq
+# Order of bases in the encoder state machine
+BASES = "ACGT"
+
+def build_transition_table():
+    """
+    Precompute the encoder state machine for random synonym choice plus homopolymer avoidance.
+    
+    A state packs (last_base, run_len) into one integer: BASES.index(last_base) * (HOMOPOLYMER_LIMIT + 1) + run_len.
+    A run_len of 0 means no base has been emitted yet.
+    
+    Returns:
+        list: For each state, a dict mapping bit -> pick -> (ASCII code of base, next_state).
+    """
+    states_per_base = HOMOPOLYMER_LIMIT + 1
+    table = []
+    for state in range(len(BASES) * states_per_base):
+        last_base, run_len = BASES[state // states_per_base], state % states_per_base
+        row = {}
+        for bit, synonyms in BIT_TO_BASE.items():
+            row[bit] = {}
+            for pick in '01':
+                base = avoid_homopolymer((last_base, run_len), synonyms[pick == '1'])
+                next_run_len = run_len + 1 if base == last_base else 1
+                row[bit][pick] = (ord(base), BASES.index(base) * states_per_base + next_run_len)
+        table.append(row)
+    return table
+
+# 4 bases x (HOMOPOLYMER_LIMIT + 1) run lengths x 2 bits x 2 picks = 64 entries
+TRANSITIONS = build_transition_table()
+
+def encode_bits_to_dna(bits, state=(None, 0), rng=random):
+    """Convert a sequence of bits into a DNA sequence, drawing synonym choices from rng."""
+    last_base, run_len = state
+    current = BASES.index(last_base) * (HOMOPOLYMER_LIMIT + 1) + run_len if last_base else 0
+    # Fill a preallocated buffer by index instead of growing a string
+    dna_seq = bytearray(len(bits))
+    # Draw all synonym choices at once instead of one random.choice call per bit
+    picks = format(rng.getrandbits(len(bits)), f"0{len(bits)}b") if bits else ""
+    for i, (bit, pick) in enumerate(zip(bits, picks)):
+        # Random synonym choice and homopolymer avoidance in one table lookup
+        dna_seq[i], current = TRANSITIONS[current][bit][pick]
+    return dna_seq.decode('ascii')
+
+@functools.lru_cache(maxsize=1 << 19)
+def encode_address(address):
+    """
+    Encode a 19-bit address into DNA.
+    
+    Synonym choices are seeded by the address itself, so the result is deterministic
+    and memoized: addresses restart at 1 in every block and are only encoded once.
+    
+    Args:
+        address (int): Oligo address.
+        
+    Returns:
+        str: 19-nt DNA sequence of the address.
+    """
+    return encode_bits_to_dna(f"{address:019b}", rng=random.Random(address))
 
 def calculate_crc32_checksum(data_bits):
-    """Calculate a 32-bit CRC checksum for the given data bits."""
-    # Convert bits to bytes
+    """
+    Calculate a 32-bit CRC checksum for the given data bits.
+    
+    Thin wrapper around zlib.crc32 for callers that still hold a bit string;
+    bytes_to_dna_with_crc32 checksums the segment bytes directly.
+    
+    Args:
+        data_bits (str): Data as a string of '0' and '1' characters.
+    
+    Returns:
+        str: 32-bit binary string of the checksum.
+    """
     byte_data = int(data_bits, 2).to_bytes((len(data_bits) + 7) // 8, byteorder='big')
-    checksum = zlib.crc32(byte_data)  # 32-bit CRC checksum
-    return f"{checksum:032b}"  # Return checksum as a 32-bit binary string
+    return f"{zlib.crc32(byte_data):032b}"
 
-def bits_to_dna_with_crc32(bits, forward_primer, reverse_primer, segment_length=12, max_address=524288):
+def bytes_to_dna_with_crc32(data, forward_primer, reverse_primer, segment_length=12, max_address=524288):
     """
-    Encode a bitstream string into DNA oligos with CRC32 checksum.
+    Encode a byte string into DNA oligos with CRC32 checksum.
 
     Args:
-        bits (str): Input bitstream.
+        data (bytes): Input data.
         forward_primer (str): Forward primer sequence.
         reverse_primer (str): Reverse primer sequence.
         segment_length (int): Length of data in bytes per segment.
@@ -58,63 +128,87 @@ def bits_to_dna_with_crc32(bits, forward_primer, reverse_primer, segment_length=
     """
     oligos_with_details = []
     address = 1  # Start address at 1 (0000000000000000001)
-    last_bases = []
-
-    # Validate input
-    if not all(bit in "01" for bit in bits):
-        raise ValueError("Input contains invalid characters. Only '0' and '1' are allowed.")
+    state = (None, 0)  # Homopolymer state (last_base, run_len); each field starts a new run
 
-    # Process bitstream into DNA oligos
-    for i in range(0, len(bits), segment_length * 8):  # Segment length is in bytes (8 bits/byte)
-        if address > max_address:
-            break  # Stop if max address is exceeded
+    # Pad the data once so every segment is complete, then take zero-copy views of it
+    num_segments = min((len(data) + segment_length - 1) // segment_length, max_address)
+    padded = memoryview(bytes(data[:num_segments * segment_length]).ljust(num_segments * segment_length, b'\0'))
+    segments = [padded[i:i + segment_length] for i in range(0, num_segments * segment_length, segment_length)]
+    if segment_length < 12:
+        segments = [bytes(segment).ljust(12, b'\0') for segment in segments]  # Ensure 96 bits with padding
+    
+    # Calculate the CRC32 checksums of all segments in one pass
+    checksums = list(map(zlib.crc32, segments))
+    
+    # Bind the primers once; a missing primer simply contributes nothing to the oligo
+    forward_primer = forward_primer or ''
+    reverse_primer = reverse_primer or ''
 
+    # Process data into DNA oligos
+    for chunk, checksum in zip(segments, checksums):
         # Encode the 19-bit address
         address_bits = f"{address:019b}"  # Convert address to 19-bit binary
-        address_dna = encode_bits_to_dna(address_bits, last_bases.copy())  # Use a copy to avoid affecting next encodings
-
-        # Get the 96-bit data block
-        data_bits = bits[i:i + segment_length * 8].ljust(96, '0')  # Ensure 96 bits with padding if needed
+        address_dna = encode_address(address)
+        
+        # Format the CRC32 checksum as a 32-bit binary string
+        crc32_checksum_bits = f"{checksum:032b}"
 
-        # Calculate CRC32 checksum for the data block
-        crc32_checksum_bits = calculate_crc32_checksum(data_bits)
+        # Expand to bits only for the DNA encoding
+        data_bits = f"{int.from_bytes(chunk, byteorder='big'):0{len(chunk) * 8}b}"
 
         # Encode data into DNA
-        data_dna = encode_bits_to_dna(data_bits, last_bases.copy())
+        data_dna = encode_bits_to_dna(data_bits, state)
         
         # Encode CRC32 into DNA
-        crc32_dna = encode_bits_to_dna(crc32_checksum_bits, last_bases.copy())
+        crc32_dna = encode_bits_to_dna(crc32_checksum_bits, state)
 
-        # Create the core oligo (address + data + CRC32)
-        core_oligo = address_dna + data_dna + crc32_dna
+        # Build primer + core oligo (address + data + CRC32) + primer in a single pass
+        complete_oligo = f"{forward_primer}{address_dna}{data_dna}{crc32_dna}{reverse_primer}"
         
-        # Add primers if provided
-        complete_oligo = core_oligo
-        if forward_primer:
-            complete_oligo = forward_primer + complete_oligo
-        if reverse_primer:
-            complete_oligo = complete_oligo + reverse_primer
-            
         oligos_with_details.append((address_bits, data_bits, crc32_checksum_bits, complete_oligo))
 
         address += 1  # Increment address for the next segment
 
     return oligos_with_details
 
+def bits_to_dna_with_crc32(bits, forward_primer, reverse_primer, segment_length=12, max_address=524288):
+    """
+    Encode a bitstream string into DNA oligos with CRC32 checksum.
+    
+    Thin wrapper around bytes_to_dna_with_crc32 for callers that still hold a bitstream.
+    
+    Args:
+        bits (str): Input bitstream.
+        forward_primer (str): Forward primer sequence.
+        reverse_primer (str): Reverse primer sequence.
+        segment_length (int): Length of data in bytes per segment.
+        max_address (int): Maximum number of addresses.
+    
+    Returns:
+        list: List of tuples (address, data_bits, crc32_checksum, DNA oligo).
+    """
+    # Validate input
+    if bits.strip("01"):
+        raise ValueError("Input contains invalid characters. Only '0' and '1' are allowed.")
+    
+    # Pad to whole bytes, matching the zero padding of the last segment
+    num_bytes = (len(bits) + 7) // 8
+    data = int(bits.ljust(num_bytes * 8, '0') or '0', 2).to_bytes(num_bytes, byteorder='big')
+    return bytes_to_dna_with_crc32(data, forward_primer, reverse_primer, segment_length, max_address)
+
 def read_binary_file(file_path):
     """
-    Read a binary file and convert its contents to a bitstream.
+    Read a binary file.
 
     Args:
         file_path (str): Path to the binary file.
 
     Returns:
-        tuple: (Bitstream as a string of '0' and '1', file size in bytes).
+        tuple: (File contents as bytes, file size in bytes).
     """
     with open(file_path, 'rb') as file:
         binary_data = file.read()
-    file_size = len(binary_data)
-    return ''.join(f"{byte:08b}" for byte in binary_data), file_size  # Convert bytes to a string of bits
+    return binary_data, len(binary_data)
 
 def save_to_csv_with_blocks(file_path, oligos_with_details, total_data_size, block_size_bytes):
     """
@@ -126,7 +220,8 @@ def save_to_csv_with_blocks(file_path, oligos_with_details, total_data_size, blo
         total_data_size (int): Total input data size in bytes.
         block_size_bytes (int): Maximum size of each block in bytes.
     """
-    with open(file_path, 'w', newline='') as csvfile:
+    # Use a large write buffer so millions of rows don't turn into millions of small writes
+    with open(file_path, 'w', newline='', buffering=1 << 20) as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow([
             "Block Index", 
@@ -139,20 +234,15 @@ def save_to_csv_with_blocks(file_path, oligos_with_details, total_data_size, blo
             "Total File Size (Bytes)"
         ])
         
-        for block_index, address_bits, data_bits, crc32_checksum, oligo, actual_block_bytes in oligos_with_details:
-            writer.writerow([
-                block_index, 
-                address_bits, 
-                data_bits, 
-                crc32_checksum, 
-                oligo, 
-                block_size_bytes,
-                actual_block_bytes,
-                total_data_size
-            ])
+        # Let the csv module drive the loop over a generator of rows
+        writer.writerows(
+            (block_index, address_bits, data_bits, crc32_checksum, oligo,
+             block_size_bytes, actual_block_bytes, total_data_size)
+            for block_index, address_bits, data_bits, crc32_checksum, oligo, actual_block_bytes in oligos_with_details
+        )
 
 def encode_file_to_dna(input_file_path, output_csv_path, forward_primer=None, reverse_primer=None, 
-                   check_file_size=False, max_file_size=100*1024, block_size_bytes=1024):
+                   check_file_size=False, max_file_size=100*1024, block_size_bytes=1024, max_workers=1):
     """
     Main function to encode a binary file into DNA sequences and save to CSV.
     
@@ -164,10 +254,42 @@ def encode_file_to_dna(input_file_path, output_csv_path, forward_primer=None, re
         check_file_size (bool, optional): Whether to check if file size exceeds maximum.
         max_file_size (int, optional): Maximum allowed file size in bytes.
         block_size_bytes (int, optional): Size of each DNA data block in bytes.
+        max_workers (int, optional): Number of worker processes used to encode blocks in
+            parallel. None uses all CPUs; the default of 1 encodes in this process.
         
     Returns:
         tuple: (Number of oligos generated, Input file size in bytes, Number of blocks)
     """
+    # Check the file size if needed, before reading anything
+    file_size = os.path.getsize(input_file_path)
+    if check_file_size and file_size > max_file_size:
+        raise ValueError(f"File size exceeds the maximum allowed size of {max_file_size / 1024} KB.")
+    
+    # Read the binary file
+    data, _ = read_binary_file(input_file_path)
+    
+    return encode_bytes_to_dna(data, output_csv_path, forward_primer, reverse_primer,
+                               block_size_bytes=block_size_bytes, max_workers=max_workers)
+
+def encode_bytes_to_dna(data, output_csv_path, forward_primer=None, reverse_primer=None, 
+                        check_file_size=False, max_file_size=100*1024, block_size_bytes=1024, max_workers=1):
+    """
+    Encode an in-memory buffer into DNA sequences and save to CSV.
+    
+    Args:
+        data (bytes): Data to encode (any bytes-like object).
+        output_csv_path (str): Path to save the output CSV file.
+        forward_primer (str, optional): Forward primer sequence (22 bases).
+        reverse_primer (str, optional): Reverse primer sequence (22 bases).
+        check_file_size (bool, optional): Whether to check if data size exceeds maximum.
+        max_file_size (int, optional): Maximum allowed data size in bytes.
+        block_size_bytes (int, optional): Size of each DNA data block in bytes.
+        max_workers (int, optional): Number of worker processes used to encode blocks in
+            parallel. None uses all CPUs; the default of 1 encodes in this process.
+    
+    Returns:
+        tuple: (Number of oligos generated, Input data size in bytes, Number of blocks)
+    """
     # Use default primers if not provided
     if forward_primer is None:
         forward_primer = DEFAULT_FORWARD_PRIMER
@@ -180,14 +302,11 @@ def encode_file_to_dna(input_file_path, output_csv_path, forward_primer=None, re
     if reverse_primer and len(reverse_primer) != 22:
         raise ValueError("Reverse primer must be exactly 22 bases long.")
     
-    # Check the file size if needed
-    file_size = os.path.getsize(input_file_path)
-    if check_file_size and file_size > max_file_size:
+    # Check the data size if needed
+    total_data_size = len(data)
+    if check_file_size and total_data_size > max_file_size:
         raise ValueError(f"File size exceeds the maximum allowed size of {max_file_size / 1024} KB.")
     
-    # Read the binary file and convert to bitstream
-    bits, total_data_size = read_binary_file(input_file_path)
-    
     # Calculate parameters for fixed block sizes
     # Each DNA oligo can store 12 bytes (96 bits) of data
     bytes_per_oligo = 12  # 96 bits / 8 bits per byte
@@ -196,37 +315,37 @@ def encode_file_to_dna(input_file_path, output_csv_path, forward_primer=None, re
     oligos_per_block = (block_size_bytes + bytes_per_oligo - 1) // bytes_per_oligo
     
     # Calculate total number of blocks needed
-    total_bytes = len(bits) // 8
+    total_bytes = len(data)
     num_blocks = (total_bytes + block_size_bytes - 1) // block_size_bytes
     
+    # Split the data into block-sized chunks
+    block_starts = range(0, num_blocks * block_size_bytes, block_size_bytes)
+    blocks = [data[start:start + block_size_bytes] for start in block_starts]
+    
+    # For partial blocks (typically the last block), calculate how many oligos we actually need
+    max_addresses = [
+        min(oligos_per_block, (len(block_data) + bytes_per_oligo - 1) // bytes_per_oligo)
+        for block_data in blocks
+    ]
+    
+    # Encode each block into DNA oligos
+    # Blocks are independent, so they can be spread across worker processes
+    encode_args = (blocks, repeat(forward_primer), repeat(reverse_primer), repeat(bytes_per_oligo), max_addresses)
+    if max_workers != 1 and num_blocks > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            encoded_blocks = list(executor.map(bytes_to_dna_with_crc32, *encode_args))
+    else:
+        encoded_blocks = list(map(bytes_to_dna_with_crc32, *encode_args))
+    
     # Create a list to store all oligos for all blocks
     all_oligos_with_details = []
     
-    # Process the bitstream in block-sized chunks
-    for block_index in range(num_blocks):
-        # Calculate start and end positions for this block
-        start_bit = block_index * block_size_bytes * 8
-        end_bit = min(start_bit + block_size_bytes * 8, len(bits))
-        block_bits = bits[start_bit:end_bit]
-        
+    for block_index, (block_data, block_oligos) in enumerate(zip(blocks, encoded_blocks)):
         # Calculate actual bytes in this block
-        actual_block_bytes = (len(block_bits) + 7) // 8  # Round up to nearest byte
-        
-        # For partial blocks (typically the last block), calculate how many oligos we actually need
-        actual_oligos_needed = (actual_block_bytes + bytes_per_oligo - 1) // bytes_per_oligo
-        max_address_for_block = min(oligos_per_block, actual_oligos_needed)
-        
-        # Encode this block into DNA oligos
-        block_oligos = bits_to_dna_with_crc32(
-            block_bits, 
-            forward_primer, 
-            reverse_primer,
-            segment_length=bytes_per_oligo,
-            max_address=max_address_for_block
-        )
+        actual_block_bytes = len(block_data)
         
         # Add block information to each oligo
-        for i, (address_bits, data_bits, crc32_bits, oligo) in enumerate(block_oligos):
+        for address_bits, data_bits, crc32_bits, oligo in block_oligos:
             # Add block index and actual block size to the tuple for tracking
             all_oligos_with_details.append((
                 block_index, 
@@ -11,8 +11,226 @@ import sys
 import tempfile
 import csv
 import shutil
-from church_algorithm_encoder import encode_file_to_dna
-from church_algorithm_decoder import decode_oligos_from_csv, decode_oligos_from_fastq, BASE_TO_BIT
+import mmap
+import re
+import zlib
+from operator import itemgetter
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from church_algorithm_encoder import encode_bytes_to_dna
+from church_algorithm_decoder import decode_oligos_from_csv, decode_oligos_from_fastq, decode_dna_to_bits
+
+# Block file names written by encode_file: poolX_blockY.csv (or any other extension)
+_BLOCK_FILENAME_RE = re.compile(r'pool(\d+)_block(\d+)\.\w+$')
+
+def _read_block(in_file, start_offset, block_length):
+    """
+    Read one block of a file without touching any shared file position
+    
+    Args:
+        in_file (str): Path to the input binary file
+        start_offset (int): Byte offset where the block starts
+        block_length (int): Number of bytes to read
+        
+    Returns:
+        bytes: The block contents (shorter than block_length at end of file)
+    """
+    # os.pread is a single positioned read; it is not available on Windows
+    if not hasattr(os, 'pread'):
+        with open(in_file, 'rb') as f:
+            f.seek(start_offset)
+            return f.read(block_length)
+            
+    fd = os.open(in_file, os.O_RDONLY)
+    try:
+        return os.pread(fd, block_length, start_offset)
+    finally:
+        os.close(fd)
+
+def _append_file(in_file, out_f):
+    """
+    Append the contents of a file to an open binary output file
+    
+    Uses os.sendfile so the bytes go from file to file inside the kernel, without a
+    round trip through a user-space buffer. Where sendfile is missing or cannot write
+    to a regular file, the rest is streamed through a 1 MiB buffer instead.
+    
+    Args:
+        in_file (str): Path of the file to append
+        out_f (file): Output file opened for binary writing
+    """
+    with open(in_file, 'rb') as in_f:
+        offset = 0
+        if hasattr(os, 'sendfile'):
+            out_f.flush()
+            try:
+                while True:
+                    sent = os.sendfile(out_f.fileno(), in_f.fileno(), offset, 1 << 30)
+                    if sent == 0:
+                        return
+                    offset += sent
+            except OSError:
+                in_f.seek(offset)
+        
+        shutil.copyfileobj(in_f, out_f, 1 << 20)
+
+def _strip_primers(sequence, forward_primer, reverse_primer):
+    """
+    Remove a leading forward primer and a trailing reverse primer, where present
+    
+    The trim bounds are worked out first so at most one slice is made.
+    
+    Args:
+        sequence (str): DNA sequence
+        forward_primer (str): Forward primer (empty or None to skip)
+        reverse_primer (str): Reverse primer (empty or None to skip)
+        
+    Returns:
+        str: Sequence without primers
+    """
+    start = 0
+    end = len(sequence)
+    
+    # Remove forward primer if present
+    if forward_primer and sequence.startswith(forward_primer):
+        start = len(forward_primer)
+        
+    # Remove reverse primer if present (it must lie after the forward primer)
+    if reverse_primer and sequence.endswith(reverse_primer, start):
+        end -= len(reverse_primer)
+        
+    return sequence[start:end]
+
+# Bases as base-4 digits, so int(..., 4) packs a sequence at 2 bits per base (A=0, C=1, G=2, T=3)
+_BASE_DIGITS = str.maketrans('ACGT', '0123')
+
+def _pack_bases(sequence):
+    """
+    Pack a DNA sequence into an integer, 2 bits per base, first base most significant
+    
+    Args:
+        sequence (str): DNA sequence
+    
+    Returns:
+        tuple: (packed sequence, mask with the low bit of every base set), or None if the
+            sequence is empty or contains anything other than A, C, G and T
+    """
+    digits = sequence.translate(_BASE_DIGITS)
+    if not digits.isdigit():
+        return None
+    try:
+        return int(digits, 4), int('1' * len(digits), 4)
+    except ValueError:
+        return None
+
+def _base_mismatches(a, b, mask):
+    """
+    Count the bases that differ between two sequences packed by _pack_bases
+    
+    Args:
+        a (int): Packed sequence
+        b (int): Packed sequence of the same length
+        mask (int): Low-bit mask returned by _pack_bases for that length
+    
+    Returns:
+        int: Number of mismatching bases
+    """
+    # A base differs when either of its two bits does; fold the high bit onto the low one
+    diff = a ^ b
+    return ((diff | diff >> 1) & mask).bit_count()
+
+def _smith_waterman(pattern, text, match=2, mismatch=-1, gap=-2):
+    """
+    Smith-Waterman local alignment of a pattern (e.g. a primer) against a text
+    
+    Uses linear gap penalties and keeps only one row of the score matrix.
+    
+    Args:
+        pattern (str): Sequence to look for
+        text (str): Sequence to search in
+        match (int, optional): Score for a matching base
+        mismatch (int, optional): Score for a mismatching base
+        gap (int, optional): Score for an insertion or deletion
+        
+    Returns:
+        tuple: (Best score, pattern index just past the alignment, text index just past the alignment)
+    """
+    best_score, best_i, best_j = 0, 0, 0
+    prev = [0] * (len(text) + 1)
+    
+    for i, p in enumerate(pattern, 1):
+        curr = [0]
+        left = 0
+        for j, t in enumerate(text, 1):
+            left = max(0, prev[j - 1] + (match if p == t else mismatch), prev[j] + gap, left + gap)
+            curr.append(left)
+            if left > best_score:
+                best_score, best_i, best_j = left, i, j
+        prev = curr
+        
+    return best_score, best_i, best_j
+
+def _encode_block_data(in_file, out_file, block_index, pool, start_offset, block_length,
+                       forward_primer, reverse_primer, source_buffer=None, return_digest=False):
+    """
+    Encode one block of a file with the given primers
+    
+    Shared by MolFSDev.encode_block and the worker processes of encode_file, so it
+    only uses its arguments and never touches device state.
+    
+    Args:
+        in_file (str): Path to the input binary file
+        out_file (str): Path to save the DNA sequences
+        block_index (int): Index of this block (for reconstruction)
+        pool (int): Pool the block is assigned to
+        start_offset (int): Byte offset where this block starts in the file
+        block_length (int): Length of this block in bytes
+        forward_primer (str): Forward primer to use
+        reverse_primer (str): Reverse primer to use
+        source_buffer (bytes-like, optional): Already opened contents of in_file (e.g. an mmap);
+            when given the block is sliced from it instead of reopening in_file
+        return_digest (bool, optional): Add the CRC32 hex digest (8 hex digits) of the encoded
+            bytes to the block information as "digest"
+    
+    Returns:
+        tuple: (Success status, Block information)
+    """
+    try:
+        # Extract this block from the file and encode it straight from memory
+        if source_buffer is not None:
+            block_data = source_buffer[start_offset:start_offset + block_length]
+        else:
+            block_data = _read_block(in_file, start_offset, block_length)
+        
+        # Encode this block
+        num_oligos, file_size, num_blocks = encode_bytes_to_dna(
+            block_data,
+            out_file,
+            forward_primer=forward_primer,
+            reverse_primer=reverse_primer,
+            block_size_bytes=block_length  # Use the actual block length
+        )
+        
+        print(f"Encoded block {block_index} ({len(block_data)} bytes) into {num_oligos} DNA oligos")
+        print(f"Block assigned to Pool {pool}")
+        
+        block_info = {
+            "block_index": block_index,
+            "pool": pool,
+            "block_size": len(block_data),
+            "num_oligos": num_oligos
+        }
+        
+        # Hash the block while it is still in memory
+        if return_digest:
+            block_info["digest"] = f"{zlib.crc32(block_data):08x}"
+        
+        return True, block_info
+    
+    except Exception as e:
+        print(f"Error encoding block {block_index}: {e}")
+        return False, {}
 
 class MolFSDev:
     """
@@ -22,6 +240,17 @@ class MolFSDev:
     for use with the Molecular File System (MolFS).
     """
     
+    # Every instance attribute is set in __init__; slots drop the per-instance __dict__
+    __slots__ = (
+        'DoubleStep', 'ValidDecode',
+        'encodeParam', 'decodeParam',
+        'Address', 'Block', 'Pool',
+        'Redundancy', 'MaxIterations',
+        'block_size_bytes', '_temp_dir',
+        'primer_registry', '_forward_primer_index', '_forward_primer_lengths', '_default_primer_pair',
+        '_packed_primers'
+    )
+    
     # Default universal primers (can be overridden)
     DEFAULT_FORWARD_PRIMER = "CTACACGACGCTCTTCCGATCT"
     DEFAULT_REVERSE_PRIMER = "AGATCGGAAGAGCGGTTCAGCA"
@@ -29,6 +258,13 @@ class MolFSDev:
     # Whether to use FastQ format (for future implementation)
     UseFastQ = False
     
+    # ClassifySequence_SW: minimum alignment score as a fraction of a perfect primer match,
+    # how many extra bases around the expected primer position to search, and how many
+    # trailing primer bases must match exactly to skip the alignment for a gapless match
+    SW_MIN_SCORE_FRACTION = 0.8
+    SW_WINDOW_SLACK = 8
+    SW_ANCHOR_BASES = 4
+    
     def __init__(self):
         """
         Initialize the Church Algorithm interface for MolFS
@@ -49,21 +285,57 @@ class MolFSDev:
         # Block size configuration (in bytes)
         self.block_size_bytes = 5 * 1024  # Default: 5KB blocks
         
-        # Create temporary directory for intermediate files
-        self.temp_dir = tempfile.mkdtemp(prefix="church_molfs_")
+        # Temporary directory for intermediate files, created on first use
+        self._temp_dir = None
         
         # Initialize primer registry
         # This allows external code to register primers for specific Pool/Block combinations
         self.primer_registry = {}
+        
+        # Forward primer -> (registration order, pool, block, forward, reverse), so
+        # ClassifySequence can look a read's prefix up instead of scanning the registry
+        self._forward_primer_index = {}
+        self._forward_primer_lengths = []
+        
+        # Returned by get_primers for unregistered Pool/Block pairs, built once
+        self._default_primer_pair = (self.DEFAULT_FORWARD_PRIMER, self.DEFAULT_REVERSE_PRIMER)
+        
+        # Forward primer -> (2-bit packed primer, mask) from _pack_bases, filled in when primers
+        # are registered so ClassifySequence_SW can count mismatches with integer operations
+        self._packed_primers = {self.DEFAULT_FORWARD_PRIMER: _pack_bases(self.DEFAULT_FORWARD_PRIMER)}
+    
+    @property
+    def temp_dir(self):
+        """
+        Temporary directory for intermediate files (created on first access)
+        """
+        if self._temp_dir is None:
+            self._temp_dir = tempfile.mkdtemp(prefix="church_molfs_")
+        return self._temp_dir
+    
+    def close(self):
+        """
+        Remove the temporary directory, if one was created
+        """
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
     
     def __del__(self):
         """
         Clean up temporary directory when the object is destroyed
+        
+        Prefer close() or a with block; __del__ is not guaranteed to run.
         """
         try:
-            if os.path.exists(self.temp_dir):
-                shutil.rmtree(self.temp_dir)
-        except:
+            self.close()
+        except Exception:
             pass
     
     def set_block_size(self, size_bytes):
@@ -87,6 +359,16 @@ class MolFSDev:
         """
         key = (pool, block)
         self.primer_registry[key] = (forward_primer, reverse_primer)
+        
+        # Rebuild the prefix index; the earliest registration wins when primers are shared
+        self._forward_primer_index = {}
+        for order, ((p, b), (fwd, rev)) in enumerate(self.primer_registry.items()):
+            self._forward_primer_index.setdefault(fwd, (order, p, b, fwd, rev))
+        self._forward_primer_lengths = sorted({len(fwd) for fwd in self._forward_primer_index})
+        
+        # Pack the forward primer once here rather than on every classified read
+        if forward_primer not in self._packed_primers:
+            self._packed_primers[forward_primer] = _pack_bases(forward_primer)
     
     def get_primers(self, pool, block):
         """
@@ -99,16 +381,16 @@ class MolFSDev:
         Returns:
             tuple: (forward_primer, reverse_primer)
         """
-        key = (pool, block)
-        
-        # Return registered primers if available
-        if key in self.primer_registry:
-            return self.primer_registry[key]
+        # Return registered primers if available (a single hash lookup)
+        primers = self.primer_registry.get((pool, block))
+        if primers is not None:
+            return primers
         
         # Otherwise, return default primers
-        return self.DEFAULT_FORWARD_PRIMER, self.DEFAULT_REVERSE_PRIMER
+        return self._default_primer_pair
     
-    def encode_block(self, in_file, out_file, block_index, start_offset=0, block_length=None):
+    def encode_block(self, in_file, out_file, block_index, start_offset=0, block_length=None, source_buffer=None,
+                     forward_primer=None, reverse_primer=None, return_digest=False):
         """
         Encode a specific block from a file using the current Pool/Block settings
         
@@ -121,6 +403,13 @@ class MolFSDev:
             block_index (int): Index of this block (for reconstruction)
             start_offset (int, optional): Byte offset where this block starts in the file
             block_length (int, optional): Length of this block in bytes (defaults to block_size_bytes)
+            source_buffer (bytes-like, optional): Already opened contents of in_file (e.g. an mmap);
+                when given the block is sliced from it instead of reopening in_file
+            forward_primer (str, optional): Forward primer to use; looked up for the current
+                Pool/Block when either primer is None
+            reverse_primer (str, optional): Reverse primer to use
+            return_digest (bool, optional): Add the CRC32 hex digest (8 hex digits) of the encoded bytes
+                to the block information as "digest"
             
         Returns:
             tuple: (Success status, Block information)
@@ -129,53 +418,17 @@ class MolFSDev:
         if block_length is None:
             block_length = self.block_size_bytes
             
-        # Create a temporary file for this block
-        temp_block_file = os.path.join(self.temp_dir, f"temp_block_{block_index}.bin")
+        # Set the current block index
+        self.Block = block_index
         
-        try:
-            # Extract this block from the file
-            with open(in_file, 'rb') as f:
-                f.seek(start_offset)
-                block_data = f.read(block_length)
-                
-            # Write to temporary file
-            with open(temp_block_file, 'wb') as f:
-                f.write(block_data)
-                
-            # Set the current block index
-            self.Block = block_index
-            
-            # Get primers for the current Pool/Block
+        # Get primers for the current Pool/Block unless the caller resolved them already
+        if forward_primer is None or reverse_primer is None:
             forward_primer, reverse_primer = self.get_primers(self.Pool, self.Block)
             
-            # Encode this block
-            num_oligos, file_size, num_blocks = encode_file_to_dna(
-                temp_block_file,
-                out_file,
-                forward_primer=forward_primer,
-                reverse_primer=reverse_primer,
-                block_size_bytes=block_length  # Use the actual block length
-            )
-            
-            print(f"Encoded block {block_index} ({len(block_data)} bytes) into {num_oligos} DNA oligos")
-            print(f"Block assigned to Pool {self.Pool}")
-            
-            return True, {
-                "block_index": block_index,
-                "pool": self.Pool,
-                "block_size": len(block_data),
-                "num_oligos": num_oligos
-            }
-            
-        except Exception as e:
-            print(f"Error encoding block {block_index}: {e}")
-            return False, {}
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_block_file):
-                os.remove(temp_block_file)
+        return _encode_block_data(in_file, out_file, block_index, self.Pool, start_offset, block_length,
+                                  forward_primer, reverse_primer, source_buffer, return_digest)
     
-    def encode(self, in_file, out_file):
+    def encode(self, in_file, out_file, return_digest=False):
         """
         Encode a binary file into DNA sequences (legacy method)
         
@@ -184,35 +437,60 @@ class MolFSDev:
         Args:
             in_file (str): Path to the input binary file
             out_file (str): Path to save the DNA sequences
+            return_digest (bool, optional): Also return the CRC32 hex digest of the encoded
+                bytes, computed during encoding (None on failure)
             
         Returns:
-            tuple: (Success status, Number of blocks)
+            tuple: (Success status, Number of blocks), plus the digest if return_digest is set
         """
         # Simply delegates to encode_block with block index 0
-        success, block_info = self.encode_block(in_file, out_file, 0)
+        success, block_info = self.encode_block(in_file, out_file, 0, return_digest=return_digest)
         
-        if success:
-            return True, 1
-        else:
-            return False, 0
+        result = (True, 1) if success else (False, 0)
+        if return_digest:
+            return result + (block_info.get("digest"),)
+        return result
     
-    def encode_file(self, in_file, out_dir, distribution_strategy=None):
+    def encode_bytes(self, data, out_file, return_digest=False):
+        """
+        Encode data already in memory into DNA sequences, like encode without opening a file
+        
+        Args:
+            data (bytes-like): Data to encode (bytes, memoryview, mmap, ...)
+            out_file (str): Path to save the DNA sequences
+            return_digest (bool, optional): Also return the CRC32 hex digest of the encoded
+                bytes, computed during encoding (None on failure)
+        
+        Returns:
+            tuple: (Success status, Number of blocks), plus the digest if return_digest is set
+        """
+        # Same as encode, with the data handed to encode_block as the source buffer
+        success, block_info = self.encode_block(None, out_file, 0, source_buffer=data, return_digest=return_digest)
+        
+        result = (True, 1) if success else (False, 0)
+        if return_digest:
+            return result + (block_info.get("digest"),)
+        return result
+    
+    def encode_file(self, in_file, out_dir, distribution_strategy=None, parallel=False):
         """
         Encode an entire file across multiple pools using a distribution strategy
         
         Args:
             in_file (str): Path to the input binary file
             out_dir (str): Directory to save the DNA sequence files
-            distribution_strategy (callable, optional): Function that determines which pools a block goes to
+            distribution_strategy (callable, mapping or sequence, optional): Determines which pools a block goes to
                 Function signature: distribution_strategy(block_index, total_blocks) -> list of pool indices
+                A mapping or sequence is indexed directly: distribution_strategy[block_index] -> pool indices
+                and must cover every block
+            parallel (bool, optional): Encode blocks in worker processes, one per CPU
                 
         Returns:
             dict: Mapping of (pool, block) to output file and block info
-        """
-        # Create output directory if it doesn't exist
-        if not os.path.exists(out_dir):
-            os.makedirs(out_dir)
             
+        Raises:
+            ValueError: If a precomputed placement misses any block of the file
+        """
         # Get file size
         file_size = os.path.getsize(in_file)
         
@@ -223,79 +501,181 @@ class MolFSDev:
         if distribution_strategy is None:
             distribution_strategy = lambda block_idx, total: [block_idx % 3 + 1]  # Default to pools 1-3
             
-        # Track where each block is stored
+        # Resolve the pools of every block up front; precomputed placements need no call per block
+        if callable(distribution_strategy):
+            placement = [distribution_strategy(block_idx, total_blocks) for block_idx in range(total_blocks)]
+        else:
+            placement = distribution_strategy
+            
+            # A precomputed placement must name pools for every block; check before writing anything
+            if isinstance(placement, Mapping):
+                missing = [block_idx for block_idx in range(total_blocks) if block_idx not in placement]
+            else:
+                missing = list(range(len(placement), total_blocks))
+            if missing:
+                raise ValueError(f"distribution_strategy has no pools for blocks {missing} "
+                                 f"of {total_blocks}")
+        
+        # Create output directory if it doesn't exist (one call, no separate existence check)
+        os.makedirs(out_dir, exist_ok=True)
+        
+        # Track where each block is stored, and which pools received anything
         block_distribution = {}
+        pools_used = set()
         
-        # Process each block
-        for block_idx in range(total_blocks):
-            # Calculate block offset and length
-            start_offset = block_idx * self.block_size_bytes
-            block_length = min(self.block_size_bytes, file_size - start_offset)
+        if parallel and total_blocks > 1:
+            # Resolve pools and primers up front so workers share no state with this device
+            tasks = []
+            for block_idx in range(total_blocks):
+                start_offset = block_idx * self.block_size_bytes
+                block_length = min(self.block_size_bytes, file_size - start_offset)
+                
+                for pool_idx in placement[block_idx]:
+                    out_file = os.path.join(out_dir, f"pool{pool_idx}_block{block_idx}.csv")
+                    forward_primer, reverse_primer = self.get_primers(pool_idx, block_idx)
+                    tasks.append((in_file, out_file, block_idx, pool_idx, start_offset, block_length,
+                                  forward_primer, reverse_primer))
             
-            # Determine which pools this block should go to
-            target_pools = distribution_strategy(block_idx, total_blocks)
+            with ProcessPoolExecutor() as executor:
+                futures = [executor.submit(_encode_block_data, *task) for task in tasks]
+                results = [future.result() for future in futures]
             
-            for pool_idx in target_pools:
-                # Set the current pool
-                self.Pool = pool_idx
-                
-                # Create output filename
-                out_file = os.path.join(out_dir, f"pool{pool_idx}_block{block_idx}.csv")
-                
-                # Encode this block
-                success, block_info = self.encode_block(
-                    in_file, 
-                    out_file, 
-                    block_idx,
-                    start_offset,
-                    block_length
-                )
-                
+            for task, (success, block_info) in zip(tasks, results):
                 if success:
-                    block_distribution[(pool_idx, block_idx)] = {
-                        "file": out_file,
+                    block_distribution[(task[3], task[2])] = {
+                        "file": task[1],
                         "info": block_info
                     }
+                    pools_used.add(task[3])
+            
+            # Leave the device where the sequential loop would have left it
+            if tasks:
+                self.Pool, self.Block = tasks[-1][3], tasks[-1][2]
+            
+            print(f"Encoded {file_size} bytes into {total_blocks} blocks across {len(pools_used)} pools")
+            return block_distribution
+        
+        # Map the input once and slice every block out of it instead of reopening the file per block
+        # (mmap refuses empty files, but then there are no blocks to encode either)
+        with open(in_file, 'rb') as f, \
+                (mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if file_size else memoryview(b'')) as source:
+            # Process each block
+            for block_idx in range(total_blocks):
+                # Calculate block offset and length
+                start_offset = block_idx * self.block_size_bytes
+                block_length = min(self.block_size_bytes, file_size - start_offset)
+                
+                # Determine which pools this block should go to
+                target_pools = placement[block_idx]
+                
+                for pool_idx in target_pools:
+                    # Set the current pool
+                    self.Pool = pool_idx
                     
-        print(f"Encoded {file_size} bytes into {total_blocks} blocks across {len(set(p for p, _ in block_distribution.keys()))} pools")
+                    # Create output filename
+                    out_file = os.path.join(out_dir, f"pool{pool_idx}_block{block_idx}.csv")
+                    
+                    # Encode this block with primers resolved from the loop variables
+                    forward_primer, reverse_primer = self.get_primers(pool_idx, block_idx)
+                    success, block_info = self.encode_block(
+                        in_file, 
+                        out_file, 
+                        block_idx,
+                        start_offset,
+                        block_length,
+                        source_buffer=source,
+                        forward_primer=forward_primer,
+                        reverse_primer=reverse_primer
+                    )
+                    
+                    if success:
+                        block_distribution[(pool_idx, block_idx)] = {
+                            "file": out_file,
+                            "info": block_info
+                        }
+                        pools_used.add(pool_idx)
+                    
+        print(f"Encoded {file_size} bytes into {total_blocks} blocks across {len(pools_used)} pools")
         return block_distribution
     
-    def decode(self, in_file, out_file):
+    def decode(self, in_file, out_file, return_digest=False):
         """
         Decode DNA sequences back to the original binary file
         
         Args:
             in_file (str): Path to the input file with DNA sequences (FASTQ or CSV)
             out_file (str): Path to save the decoded binary file
+            return_digest (bool, optional): Also return the CRC32 hex digest of the decoded
+                bytes, computed before they are written (None on failure)
             
         Returns:
-            tuple: (Success status, Block information)
+            tuple: (Success status, Block information), plus the digest if return_digest is set
         """
-        self.ValidDecode = False
-        
         # Get primers for the current Pool/Block
         forward_primer, reverse_primer = self.get_primers(self.Pool, self.Block)
         
+        success, block_info = self._finish_decode(
+            partial(self._decode_file, in_file, out_file, forward_primer, reverse_primer, return_digest))
+        
+        if return_digest:
+            return success, block_info, block_info.get("output_digest")
+        return success, block_info
+    
+    def _decode_file(self, in_file, out_file, forward_primer, reverse_primer, output_digest=False):
+        """
+        Decode a DNA sequence file without touching the device state
+        
+        Safe to run from several threads at once; decode() and reconstruct_file()
+        apply the result to the device through _finish_decode().
+        
+        Args:
+            in_file (str): Path to the input file with DNA sequences (FASTQ or CSV)
+            out_file (str): Path to save the decoded binary file
+            forward_primer (str): Forward primer to strip
+            reverse_primer (str): Reverse primer to strip
+            output_digest (bool, optional): Record the CRC32 hex digest of the decoded bytes
+                in the block information as "output_digest"
+        
+        Returns:
+            tuple: (Decoded blocks, Block information)
+        """
         # Check file extension to determine how to handle it
         file_extension = os.path.splitext(in_file)[1].lower()
         
+        if file_extension in ['.fastq', '.fq']:
+            # Handle FASTQ file (raw sequencing data without consensus/error correction)
+            return decode_oligos_from_fastq(
+                in_file,
+                forward_primer=forward_primer,
+                reverse_primer=reverse_primer,
+                output_file=out_file,
+                output_digest=output_digest
+            )
+        
+        # Handle CSV file (processed data)
+        return decode_oligos_from_csv(
+            in_file,
+            forward_primer=forward_primer,
+            reverse_primer=reverse_primer,
+            output_file=out_file,
+            output_digest=output_digest
+        )
+    
+    def _finish_decode(self, get_result):
+        """
+        Report a decode result and update the device state from it
+        
+        Args:
+            get_result (callable): Returns (decoded_blocks, block_info) or raises, e.g. a
+                bound _decode_file call or a Future's result method
+        
+        Returns:
+            tuple: (Success status, Block information)
+        """
+        self.ValidDecode = False
+        
         try:
-            if file_extension in ['.fastq', '.fq']:
-                # Handle FASTQ file (raw sequencing data without consensus/error correction)
-                decoded_blocks, block_info = decode_oligos_from_fastq(
-                    in_file,
-                    forward_primer=forward_primer,
-                    reverse_primer=reverse_primer,
-                    output_file=out_file
-                )
-            else:
-                # Handle CSV file (processed data)
-                decoded_blocks, block_info = decode_oligos_from_csv(
-                    in_file,
-                    forward_primer=forward_primer,
-                    reverse_primer=reverse_primer,
-                    output_file=out_file
-                )
+            decoded_blocks, block_info = get_result()
             
             if decoded_blocks:
                 self.ValidDecode = True
@@ -346,53 +726,61 @@ class MolFSDev:
             "pools_used": set()
         }
         
-        # Process each block file
-        for csv_file in block_files:
+        # Work out Pool/Block for every file up front
+        jobs = []
+        for file_num, csv_file in enumerate(block_files):
             # Determine Pool/Block from filename
             # Expected format: poolX_blockY.csv
-            try:
-                filename = os.path.basename(csv_file)
-                pool_str = filename.split('_')[0].replace('pool', '')
-                block_str = filename.split('_')[1].replace('block', '').split('.')[0]
-                
-                pool_idx = int(pool_str)
-                block_idx = int(block_str)
-            except:
+            match = _BLOCK_FILENAME_RE.match(os.path.basename(csv_file))
+            if match:
+                pool_idx = int(match[1])
+                block_idx = int(match[2])
+            else:
                 # If filename doesn't match expected pattern, try to extract from file content
                 pool_idx = -1
                 block_idx = -1
                 
-            # Set the current Pool/Block
-            self.Pool = pool_idx
-            self.Block = block_idx
-            
-            # Create temporary output file for this block
-            temp_out_file = os.path.join(self.temp_dir, f"block_{block_idx}.bin")
+            # Temporary output file for this block; numbered per input file so
+            # redundant copies of a block never overwrite each other
+            temp_out_file = os.path.join(self.temp_dir, f"block_{block_idx}_{file_num}.bin")
+            jobs.append((csv_file, pool_idx, block_idx, temp_out_file))
             
-            # Decode this block
-            success, block_info = self.decode(csv_file, temp_out_file)
+        # Decode the files on a thread pool so reading one overlaps decoding another,
+        # then fold the results in input order exactly as a serial loop would
+        with ThreadPoolExecutor(max_workers=max(1, min(len(jobs), os.cpu_count() or 1))) as executor:
+            futures = [
+                executor.submit(self._decode_file, csv_file, temp_out_file, *self.get_primers(pool_idx, block_idx))
+                for csv_file, pool_idx, block_idx, temp_out_file in jobs
+            ]
             
-            if success:
-                # Add to blocks dictionary
-                file_info["pools_used"].add(pool_idx)
+            for (csv_file, pool_idx, block_idx, temp_out_file), future in zip(jobs, futures):
+                # Set the current Pool/Block
+                self.Pool = pool_idx
+                self.Block = block_idx
                 
-                if block_idx in blocks_by_index:
-                    # We already have this block (from another pool)
-                    # Keep the one with valid CRC if possible
-                    existing_block = blocks_by_index[block_idx]
-                    if ('crc_stats' in block_info and 
-                        block_info['crc_stats']['valid'] > existing_block['info']['crc_stats']['valid']):
-                        # This block has better CRC stats
+                success, block_info = self._finish_decode(future.result)
+                
+                if success:
+                    # Add to blocks dictionary
+                    file_info["pools_used"].add(pool_idx)
+                    
+                    if block_idx in blocks_by_index:
+                        # We already have this block (from another pool)
+                        # Keep the one with valid CRC if possible
+                        existing_block = blocks_by_index[block_idx]
+                        if ('crc_stats' in block_info and 
+                            block_info['crc_stats']['valid'] > existing_block['info']['crc_stats']['valid']):
+                            # This block has better CRC stats
+                            blocks_by_index[block_idx] = {
+                                "file": temp_out_file,
+                                "info": block_info
+                            }
+                    else:
+                        # First time seeing this block
                         blocks_by_index[block_idx] = {
                             "file": temp_out_file,
                             "info": block_info
                         }
-                else:
-                    # First time seeing this block
-                    blocks_by_index[block_idx] = {
-                        "file": temp_out_file,
-                        "info": block_info
-                    }
         
         # Update file info
         file_info["total_blocks"] = len(blocks_by_index)
@@ -401,13 +789,21 @@ class MolFSDev:
         max_block_idx = max(blocks_by_index.keys()) if blocks_by_index else -1
         if max_block_idx >= 0 and all(i in blocks_by_index for i in range(max_block_idx + 1)):
             # We have all blocks - combine them
+            block_sizes = [os.path.getsize(blocks_by_index[i]["file"]) for i in range(max_block_idx + 1)]
             with open(output_file, 'wb') as out_f:
+                # Reserve the whole output in one allocation (not available on Windows);
+                # this is only a layout hint, so filesystems that refuse it are ignored
+                if hasattr(os, 'posix_fallocate') and sum(block_sizes) > 0:
+                    try:
+                        os.posix_fallocate(out_f.fileno(), 0, sum(block_sizes))
+                    except OSError:
+                        pass
+                    
                 for block_idx in range(max_block_idx + 1):
                     block_data = blocks_by_index[block_idx]
-                    with open(block_data["file"], 'rb') as in_f:
-                        data = in_f.read()
-                        out_f.write(data)
-                        file_info["total_bytes"] += len(data)
+                    # Copy the block in the kernel rather than reading it into memory
+                    _append_file(block_data["file"], out_f)
+                    file_info["total_bytes"] += block_sizes[block_idx]
             
             print(f"Successfully reconstructed file with {file_info['total_blocks']} blocks")
             print(f"Total size: {file_info['total_bytes']} bytes")
@@ -441,15 +837,7 @@ class MolFSDev:
         # Get primers for the current Pool/Block
         forward_primer, reverse_primer = self.get_primers(self.Pool, self.Block)
         
-        # Remove forward primer if present
-        if forward_primer and sequence.startswith(forward_primer):
-            sequence = sequence[len(forward_primer):]
-        
-        # Remove reverse primer if present
-        if reverse_primer and sequence.endswith(reverse_primer):
-            sequence = sequence[:-len(reverse_primer)]
-        
-        return sequence
+        return _strip_primers(sequence, forward_primer, reverse_primer)
     
     def ClassifySequence(self, sequence):
         """
@@ -468,28 +856,31 @@ class MolFSDev:
         cPool = -1
         cBlock = -1
         
-        # Try all registered primer pairs
-        for (pool, block), (forward_primer, reverse_primer) in self.primer_registry.items():
-            if sequence.startswith(forward_primer):
-                cPool = pool
-                cBlock = block
-                self.Pool = pool
-                self.Block = block
+        # Look the read's prefix up for each registered primer length (normally just 22),
+        # keeping the earliest registered match
+        match = None
+        for length in self._forward_primer_lengths:
+            entry = self._forward_primer_index.get(sequence[:length])
+            if entry is not None and (match is None or entry < match):
+                match = entry
                 
-                # Filter the sequence (remove primers)
-                oSeq = sequence[len(forward_primer):]
-                if oSeq.endswith(reverse_primer):
-                    oSeq = oSeq[:-len(reverse_primer)]
-                
-                return cPool, cBlock, oSeq
+        if match is not None:
+            _, pool, block, forward_primer, reverse_primer = match
+            cPool = pool
+            cBlock = block
+            self.Pool = pool
+            self.Block = block
+            
+            # Filter the sequence (remove primers)
+            oSeq = _strip_primers(sequence, forward_primer, reverse_primer)
+            
+            return cPool, cBlock, oSeq
         
         # If no registered primer matches, check if default primers are used
         if sequence.startswith(self.DEFAULT_FORWARD_PRIMER):
             # In this case, we can't determine Pool/Block from primers
             # but we can still return the filtered sequence
-            oSeq = sequence[len(self.DEFAULT_FORWARD_PRIMER):]
-            if oSeq.endswith(self.DEFAULT_REVERSE_PRIMER):
-                oSeq = oSeq[:-len(self.DEFAULT_REVERSE_PRIMER)]
+            oSeq = _strip_primers(sequence, self.DEFAULT_FORWARD_PRIMER, self.DEFAULT_REVERSE_PRIMER)
         
         # Return unknown Pool/Block with the filtered sequence
         # MolFS would need to use other mechanisms to determine Pool/Block
@@ -513,16 +904,13 @@ class MolFSDev:
         forward_primer, reverse_primer = self.get_primers(self.Pool, self.Block)
         
         # Extract core sequence without primers
-        core_sequence = sequence
-        if forward_primer and sequence.startswith(forward_primer):
-            core_sequence = core_sequence[len(forward_primer):]
-        if reverse_primer and core_sequence.endswith(reverse_primer):
-            core_sequence = core_sequence[:-len(reverse_primer)]
+        core_sequence = _strip_primers(sequence, forward_primer, reverse_primer)
             
         # Extract address from the first 19 nucleotides
         if len(core_sequence) >= 19:
             address_dna = core_sequence[:19]
-            address_bits = ''.join(BASE_TO_BIT[base] for base in address_dna)
+            # One table-driven translate instead of a dict lookup per base
+            address_bits = decode_dna_to_bits(address_dna)
             address_int = int(address_bits, 2)
             
             return address_int, address_bits, core_sequence
@@ -534,8 +922,13 @@ class MolFSDev:
         """
         Use Smith-Waterman algorithm to determine Pool and Block
         
-        This is a placeholder for a future implementation using
-        Smith-Waterman alignment for better error tolerance.
+        Like ClassifySequence, but tolerates sequencing errors in the primers:
+        each registered forward primer is aligned against the start of the read
+        and the best alignment scoring at least SW_MIN_SCORE_FRACTION of a perfect
+        match wins (earliest registration on ties). Exact matches take the fast path,
+        and reads whose primer only has substitutions are scored from packed 2-bit
+        codes before falling back to the full alignment. The reverse primer is
+        aligned the same way whenever it does not match exactly.
         
         Args:
             sequence (str): DNA sequence
@@ -543,9 +936,75 @@ class MolFSDev:
         Returns:
             tuple: (Pool, Block, filtered_sequence)
         """
-        # This is a placeholder for the Smith-Waterman implementation
-        # For now, return unknown Pool/Block
-        return -1, -1, sequence
+        # An exact forward primer needs no alignment; when the reverse primer matches
+        # too the read is done, otherwise only the reverse primer is aligned below
+        best = None
+        cPool, cBlock, oSeq = self.ClassifySequence(sequence)
+        if cPool != -1:
+            forward_primer, reverse_primer = self.get_primers(cPool, cBlock)
+            if not reverse_primer or sequence.endswith(reverse_primer, len(forward_primer)):
+                return cPool, cBlock, oSeq
+            best = (None, cPool, cBlock, forward_primer, reverse_primer, len(forward_primer), len(forward_primer))
+        
+        # Score every distinct forward primer, falling back to the default pair
+        candidates = []
+        if best is None:
+            candidates = sorted(self._forward_primer_index.values())
+            candidates.append((len(candidates), -1, -1, self.DEFAULT_FORWARD_PRIMER, self.DEFAULT_REVERSE_PRIMER))
+        
+        # Substitutions keep the primer in line with the read, so compare the packed primer
+        # and read prefix with one XOR and popcount each; the gapless alignment of m
+        # mismatches over n bases scores 2 * (n - m) - m, which SW can only improve on.
+        # The last SW_ANCHOR_BASES must match exactly, since an insertion or deletion near
+        # the end of the primer would otherwise pass with the cut in the wrong place
+        anchor_mask = (1 << 2 * self.SW_ANCHOR_BASES) - 1
+        prefixes = {}
+        for order, pool, block, forward_primer, reverse_primer in candidates:
+            packed = self._packed_primers.get(forward_primer)
+            length = len(forward_primer)
+            if packed is None or len(sequence) < length:
+                continue
+            if length not in prefixes:
+                prefixes[length] = _pack_bases(sequence[:length])
+            if prefixes[length] is None:
+                continue
+            if (packed[0] ^ prefixes[length][0]) & anchor_mask:
+                continue
+            mismatches = _base_mismatches(packed[0], prefixes[length][0], packed[1])
+            score = 2 * (length - mismatches) - mismatches
+            if score >= self.SW_MIN_SCORE_FRACTION * 2 * length and (best is None or score > best[0]):
+                best = (score, pool, block, forward_primer, reverse_primer, length, length)
+        
+        # Otherwise align each forward primer, allowing insertions and deletions
+        for order, pool, block, forward_primer, reverse_primer in candidates if best is None else ():
+            if not forward_primer:
+                continue
+            window = sequence[:len(forward_primer) + self.SW_WINDOW_SLACK]
+            score, primer_end, read_end = _smith_waterman(forward_primer, window)
+            if score >= self.SW_MIN_SCORE_FRACTION * 2 * len(forward_primer) and (best is None or score > best[0]):
+                best = (score, pool, block, forward_primer, reverse_primer, primer_end, read_end)
+                
+        if best is None:
+            return -1, -1, sequence
+        
+        _, cPool, cBlock, forward_primer, reverse_primer, primer_end, read_end = best
+        
+        # Cut after the primer, counting any unaligned primer bases at its end
+        start = min(len(sequence), read_end + len(forward_primer) - primer_end)
+        end = len(sequence)
+        
+        # Locate the reverse primer the same way, aligning both strings backwards
+        if reverse_primer:
+            tail = sequence[start:][-(len(reverse_primer) + self.SW_WINDOW_SLACK):]
+            score, primer_end, read_end = _smith_waterman(reverse_primer[::-1], tail[::-1])
+            if score >= self.SW_MIN_SCORE_FRACTION * 2 * len(reverse_primer):
+                end = max(start, end - (read_end + len(reverse_primer) - primer_end))
+                
+        if cPool != -1:
+            self.Pool = cPool
+            self.Block = cBlock
+            
+        return cPool, cBlock, sequence[start:end]
     
     def getPrimerPair(self, cPool, cBlock):
         """
@@ -570,17 +1029,15 @@ class MolFSDev:
         Returns:
             list: List of DNA sequences
         """
-        sequences = []
-        
         # Read sequences from CSV
-        with open(in_file, 'r', newline='') as csvfile:
+        with open(in_file, 'r', newline='', buffering=1 << 22) as csvfile:
             reader = csv.reader(csvfile)
             header = next(reader)  # Skip header row
             
             # Find the column with DNA oligos
             oligo_idx = header.index("DNA Oligo") if "DNA Oligo" in header else 3
             
-            for row in reader:
-                sequences.append(row[oligo_idx])
+            # Pull the column out in C rather than appending row by row
+            sequences = list(map(itemgetter(oligo_idx), reader))
         
         return sequences
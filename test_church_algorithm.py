@@ -1,246 +1,509 @@
 %%writefile {save_dir}test_church_algorithm.py
 
 
-#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
 Test script for the Church Algorithm implementation with MolFS integration
 
-This script performs a simple test of the encoding and decoding functionality
-to verify that the implementation works correctly.
+This script tests the encoding and decoding functionality to verify that the
+implementation works correctly. Run it with pytest; the tests share no state,
+so pytest-xdist can spread them across cores:
+
+    python -m pytest -n auto test_church_algorithm.py
 """
 
 import os
-import sys
-import shutil
 import random
+import tempfile
+import mmap
+import copy
+import functools
 import hashlib
-from church_interface import MolFSDev
+import zlib
+import inspect
+import pytest
+from church_interface import MolFSDev, _pack_bases, _base_mismatches
+from church_algorithm_encoder import bytes_to_dna_with_crc32, encode_bytes_to_dna
+from church_algorithm_decoder import decode_oligos_from_csv, decode_oligos_from_fastq, SHARD_SIZE
+
+# Each test works in its own temporary directory, created under tmpfs when available
+# (None falls back to the system temp directory) and removed when the test finishes
+TEST_ROOT = "/dev/shm" if os.path.isdir("/dev/shm") else None
 
-# Set base path for test files - adjust as needed
-BASE_PATH = "/mnt/c/Users/ParkJ/Downloads/church_test/"
+# Primers for each (pool, block) the tests use - must be exactly 22 bases
+PRIMERS = {
+    (1, 0): ("CTACACGACGCTCTTCCGATCT", "AGATCGGAAGAGCGGTTCAGCA"),
+    (1, 1): ("CTACACGACACTTTTCCGATCT", "AGATCGGAAGAGCGGAACAGCA"),
+    (1, 2): ("CTACACGACGCTAATCCGATCT", "AGATCGGAAGAGCGGGTCAGCA"),
+    (2, 1): ("CTACACGACGCTTAACCGATCT", "AGATCGGAAGAGCGGATCAGCA"),
+}
+
+@pytest.fixture(scope="session")
+def configured_device():
+    """
+    A MolFSDev with 5KB blocks and all PRIMERS registered, built once per session.
+    
+    The device is a template: tests take a copy.copy() of it, which shares the read-only
+    primer tables but keeps Pool/Block and the temporary directory per copy.
+    """
+    molfs_dev = MolFSDev()
+    molfs_dev.set_block_size(5 * 1024)
+    for (pool, block), (forward_primer, reverse_primer) in PRIMERS.items():
+        molfs_dev.register_primers(pool, block, forward_primer, reverse_primer)
+    return molfs_dev
 
 def create_test_file(path, size):
     """Create a test file with recognizable data pattern."""
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, 'wb') as f:
-        # Create a pattern: A block of 'A', a block of 'B', etc.
-        block_size = 256
-        for i in range(0, size, block_size):
-            char = bytes([65 + (i // block_size) % 26])  # A, B, C, ...
-            f.write(char * min(block_size, size - i))
+    # Create a pattern: A block of 'A', a block of 'B', etc.
+    # The pattern repeats every 26 blocks, so build one period and tile it
+    block_size = 256
+    period = bytes(65 + i // block_size for i in range(26 * block_size))  # A, B, C, ...
+    
+    # Write about 1 MiB of whole periods at a time through a matching 1 MiB buffer, so large
+    # test files cost a few big writes without holding the whole payload in memory
+    # (the encoder writes its CSV output through the same buffer size)
+    chunk = period * max(1, (1 << 20) // len(period))
+    full_chunks, remainder = divmod(size, len(chunk))
+    with open(path, 'wb', buffering=1 << 20) as f:
+        for _ in range(full_chunks):
+            f.write(chunk)
+        f.write(chunk[:remainder])
+
+# CRC32 digests of create_test_file() output by size, so a check only has to hash the
+# reconstructed file. They are keyed by a hash of create_test_file's source: editing the
+# pattern invalidates them and verification falls back to comparing against the input file.
+# To regenerate, set the key to pattern_source_key() and each digest to hash_file() of a
+# file written by create_test_file() at that size.
+EXPECTED_DIGESTS_KEY = "f319748f39362d66"
+EXPECTED_DIGESTS = {
+    5 * 1024: "37e25754",
+    15 * 1024: "0ff8ebc5",
+}
+
+@functools.lru_cache(maxsize=None)
+def pattern_source_key():
+    """Short hash of create_test_file's source, or None when the source is unavailable."""
+    try:
+        source = inspect.getsource(create_test_file)
+    except (OSError, TypeError):
+        return None
+    return hashlib.blake2b(source.encode('utf-8'), digest_size=8).hexdigest()
+
+def hash_file(path):
+    """Return the CRC32 of a file as 8 hex digits, streamed through a fixed 1 MiB buffer."""
+    # An accidental-corruption check needs no cryptographic hash; zlib's CRC32 is far cheaper
+    crc = 0
+    buf = bytearray(1 << 20)
+    view = memoryview(buf)
+    with open(path, 'rb', buffering=0) as f:
+        n = f.readinto(view)
+        while n:
+            crc = zlib.crc32(view[:n], crc)
+            n = f.readinto(view)
+    return f"{crc:08x}"
+
+def files_equal(path_a, path_b, chunk_size=1 << 20):
+    """Compare two files of equal size byte for byte through read-only memory maps."""
+    if os.path.getsize(path_a) == 0:
+        return True  # mmap refuses empty files
+    
+    with open(path_a, 'rb') as fa, open(path_b, 'rb') as fb, \
+            mmap.mmap(fa.fileno(), 0, access=mmap.ACCESS_READ) as ma, \
+            mmap.mmap(fb.fileno(), 0, access=mmap.ACCESS_READ) as mb:
+        # Slice-compare in chunks: each compare is a memcmp, and memory use stays bounded
+        for start in range(0, len(ma), chunk_size):
+            if ma[start:start + chunk_size] != mb[start:start + chunk_size]:
+                return False
+    return True
 
 def verify_file_integrity(original_file, reconstructed_file):
     """Verify that the reconstructed file matches the original."""
-    if not os.path.exists(reconstructed_file):
+    # A single stat both confirms the reconstructed file exists and gives its size
+    try:
+        reconstructed_size = os.path.getsize(reconstructed_file)
+    except FileNotFoundError:
         print(f"Error: Reconstructed file {reconstructed_file} does not exist.")
         return False
     
-    # Calculate MD5 hashes
-    with open(original_file, 'rb') as f:
-        original_hash = hashlib.md5(f.read()).hexdigest()
-    
-    with open(reconstructed_file, 'rb') as f:
-        reconstructed_hash = hashlib.md5(f.read()).hexdigest()
+    # Files of different sizes cannot match, so don't read either of them
+    original_size = os.path.getsize(original_file)
+    if original_size != reconstructed_size:
+        print(f"✗ File integrity mismatch:")
+        print(f"  Original: {original_size} bytes")
+        print(f"  Reconstructed: {reconstructed_size} bytes")
+        return False
     
-    if original_hash == reconstructed_hash:
-        print(f"✓ File integrity verified: {original_hash}")
+    # A pattern file of known size has a precomputed digest: only the reconstructed file is read
+    expected_digest = EXPECTED_DIGESTS.get(original_size)
+    if expected_digest is not None and pattern_source_key() == EXPECTED_DIGESTS_KEY:
+        reconstructed_digest = hash_file(reconstructed_file)
+        if reconstructed_digest == expected_digest:
+            print(f"✓ File integrity verified: {reconstructed_digest}")
+            return True
+        else:
+            print(f"✗ File integrity mismatch:")
+            print(f"  Expected: {expected_digest}")
+            print(f"  Reconstructed: {reconstructed_digest}")
+            return False
+    
+    # Otherwise both files are local and produced in this run, so compare the bytes directly
+    # rather than hashing each side
+    if files_equal(original_file, reconstructed_file):
+        print(f"✓ File integrity verified: {original_size} bytes match")
+        return True
+    else:
+        print("✗ File integrity mismatch: contents differ")
+        return False
+
+def verify_digests(encoded_digest, decoded_digest):
+    """Verify that the digest taken while encoding matches the one taken while decoding."""
+    if encoded_digest is not None and encoded_digest == decoded_digest:
+        print(f"✓ File integrity verified: {decoded_digest}")
         return True
     else:
         print(f"✗ File integrity mismatch:")
-        print(f"  Original: {original_hash}")
-        print(f"  Reconstructed: {reconstructed_hash}")
+        print(f"  Encoded: {encoded_digest}")
+        print(f"  Decoded: {decoded_digest}")
         return False
 
-def test_basic_functionality():
+def test_basic_functionality(configured_device):
     """Test basic encoding/decoding functionality."""
     print("\n=== Testing Basic Functionality ===")
     
-    # Create output directory
-    test_dir = os.path.join(BASE_PATH, "basic_test")
-    if os.path.exists(test_dir):
-        shutil.rmtree(test_dir)
-    os.makedirs(test_dir, exist_ok=True)
-    
-    # Create a test file (5KB)
-    test_file = os.path.join(test_dir, "input.bin")
-    create_test_file(test_file, 5 * 1024)
-    
-    # Initialize MolFS interface
-    molfs_dev = MolFSDev()
-    molfs_dev.set_block_size(5 * 1024)  # 5KB blocks
-    
-    # Register custom primers - must be exactly 22 bases
-    molfs_dev.register_primers(1, 0, "CTACACGACGCTCTTCCGATCT", "AGATCGGAAGAGCGGTTCAGCA")
-    
-    # Set the pool and block
-    molfs_dev.Pool = 1
-    molfs_dev.Block = 0
-    
-    # Encode the file
-    encoded_file = os.path.join(test_dir, "encoded.csv")
-    success, _ = molfs_dev.encode(test_file, encoded_file)
-    
-    if not success:
-        print("❌ Encoding failed")
-        return False
-    
-    # Decode the file
-    decoded_file = os.path.join(test_dir, "decoded.bin")
-    success, block_info = molfs_dev.decode(encoded_file, decoded_file)
-    
-    if not success:
-        print("❌ Decoding failed")
-        return False
-    
-    # Verify file integrity
-    return verify_file_integrity(test_file, decoded_file)
+    # Create a scratch output directory, removed when the test finishes
+    with tempfile.TemporaryDirectory(prefix="basic_test_", dir=TEST_ROOT) as test_dir:
+        # Create a test file (5KB)
+        test_file = os.path.join(test_dir, "input.bin")
+        create_test_file(test_file, 5 * 1024)
+        
+        # Copy the session MolFS interface (5KB blocks, custom primers)
+        molfs_dev = copy.copy(configured_device)
+        
+        # Set the pool and block
+        molfs_dev.Pool = 1
+        molfs_dev.Block = 0
+        
+        # Encode the file from a read-only mapping of it, hashing the data on the way in;
+        # the pages just written are still in the page cache, so nothing is read back
+        encoded_file = os.path.join(test_dir, "encoded.csv")
+        with open(test_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            success, _, encoded_digest = molfs_dev.encode_bytes(source, encoded_file, return_digest=True)
+        
+        assert success, "Encoding failed"
+        
+        # Decode the file
+        decoded_file = os.path.join(test_dir, "decoded.bin")
+        success, block_info, decoded_digest = molfs_dev.decode(encoded_file, decoded_file, return_digest=True)
+        
+        assert success, "Decoding failed"
+        
+        # Verify file integrity from the digests taken during encode and decode,
+        # without reading either file again
+        assert verify_digests(encoded_digest, decoded_digest)
 
-def test_multi_block():
+def test_multi_block(configured_device):
     """Test multi-block encoding/decoding."""
     print("\n=== Testing Multi-Block Functionality ===")
     
-    # Create output directory
-    test_dir = os.path.join(BASE_PATH, "multi_block_test")
-    if os.path.exists(test_dir):
-        shutil.rmtree(test_dir)
-    os.makedirs(test_dir, exist_ok=True)
-    
-    # Create a test file (15KB - should be 3 blocks at 5KB each)
-    test_file = os.path.join(test_dir, "input.bin")
-    create_test_file(test_file, 15 * 1024)
-    
-    # Initialize MolFS interface
-    molfs_dev = MolFSDev()
-    molfs_dev.set_block_size(5 * 1024)  # 5KB blocks
-    
-    # Register unique primers for different blocks - must be exactly 22 bases
-    molfs_dev.register_primers(1, 0, "CTACACGACGCTCTTCCGATCT", "AGATCGGAAGAGCGGTTCAGCA")
-    molfs_dev.register_primers(1, 1, "CTACACGACACTTTTCCGATCT", "AGATCGGAAGAGCGGAACAGCA")
-    molfs_dev.register_primers(1, 2, "CTACACGACGCTAATCCGATCT", "AGATCGGAAGAGCGGGTCAGCA")
-    
-    # Define a simple distribution strategy - all blocks to pool 1
-    def simple_strategy(block_idx, total_blocks):
-        return [1]  # All blocks go to Pool 1
-    
-    # Encode the file across blocks
-    encoded_dir = os.path.join(test_dir, "encoded")
-    block_distribution = molfs_dev.encode_file(test_file, encoded_dir, simple_strategy)
-    
-    # Get all block files
-    block_files = [info["file"] for _, info in block_distribution.items()]
-    
-    # Reconstruct the file
-    reconstructed_file = os.path.join(test_dir, "reconstructed.bin")
-    success, file_info = molfs_dev.reconstruct_file(block_files, reconstructed_file)
-    
-    if not success:
-        print("❌ Reconstruction failed")
-        return False
-    
-    # Verify file integrity
-    return verify_file_integrity(test_file, reconstructed_file)
+    # Create a scratch output directory, removed when the test finishes
+    with tempfile.TemporaryDirectory(prefix="multi_block_test_", dir=TEST_ROOT) as test_dir:
+        # Create a test file (15KB - should be 3 blocks at 5KB each)
+        test_file = os.path.join(test_dir, "input.bin")
+        create_test_file(test_file, 15 * 1024)
+        
+        # Copy the session MolFS interface (5KB blocks, unique primers for different blocks)
+        molfs_dev = copy.copy(configured_device)
+        
+        # Define a simple distribution strategy - all 3 blocks to pool 1, precomputed per block
+        simple_strategy = [(1,)] * 3
+        
+        # Encode the file across blocks, one worker process per block
+        encoded_dir = os.path.join(test_dir, "encoded")
+        block_distribution = molfs_dev.encode_file(test_file, encoded_dir, simple_strategy, parallel=True)
+        
+        # Get all block files
+        block_files = [info["file"] for _, info in block_distribution.items()]
+        
+        # Reconstruct the file
+        reconstructed_file = os.path.join(test_dir, "reconstructed.bin")
+        success, file_info = molfs_dev.reconstruct_file(block_files, reconstructed_file)
+        
+        assert success, "Reconstruction failed"
+        
+        # Verify file integrity
+        assert verify_file_integrity(test_file, reconstructed_file)
 
-def test_redundant_storage():
+def test_incomplete_placement(configured_device):
+    """Test that a precomputed placement missing blocks is rejected before anything is written."""
+    with tempfile.TemporaryDirectory(prefix="placement_test_", dir=TEST_ROOT) as test_dir:
+        # 15KB - 3 blocks, but each placement only covers some of them
+        test_file = os.path.join(test_dir, "input.bin")
+        create_test_file(test_file, 15 * 1024)
+        molfs_dev = copy.copy(configured_device)
+        
+        encoded_dir = os.path.join(test_dir, "encoded")
+        for placement in ([(1,)], {0: (1,), 2: (1,)}):
+            with pytest.raises(ValueError, match="no pools for blocks"):
+                molfs_dev.encode_file(test_file, encoded_dir, placement)
+            assert not os.path.exists(encoded_dir)
+
+def test_redundant_storage(configured_device):
     """Test redundant block storage across different pools."""
     print("\n=== Testing Redundant Storage ===")
     
-    # Create output directory
-    test_dir = os.path.join(BASE_PATH, "redundant_test")
-    if os.path.exists(test_dir):
-        shutil.rmtree(test_dir)
-    os.makedirs(test_dir, exist_ok=True)
-    
-    # Create a test file (15KB - should be 3 blocks at 5KB each)
-    test_file = os.path.join(test_dir, "input.bin")
-    create_test_file(test_file, 15 * 1024)
-    
-    # Initialize MolFS interface
-    molfs_dev = MolFSDev()
-    molfs_dev.set_block_size(5 * 1024)  # 5KB blocks
-    
-    # Register unique primers for different Pool/Block combinations - must be exactly 22 bases
-    # Block 1 will be in both Pool 1 and Pool 2
-    molfs_dev.register_primers(1, 0, "CTACACGACGCTCTTCCGATCT", "AGATCGGAAGAGCGGTTCAGCA")
-    molfs_dev.register_primers(1, 1, "CTACACGACACTTTTCCGATCT", "AGATCGGAAGAGCGGAACAGCA")
-    molfs_dev.register_primers(2, 1, "CTACACGACGCTTAACCGATCT", "AGATCGGAAGAGCGGATCAGCA")
-    molfs_dev.register_primers(1, 2, "CTACACGACGCTAATCCGATCT", "AGATCGGAAGAGCGGGTCAGCA")
-    
-    # Define a distribution strategy with redundancy for block 1
-    def redundant_strategy(block_idx, total_blocks):
-        if block_idx == 1:
-            # Block 1 goes to both Pool 1 and Pool 2
-            return [1, 2]
-        else:
-            # Other blocks just go to Pool 1
-            return [1]
-    
-    # Encode the file across pools
-    encoded_dir = os.path.join(test_dir, "encoded")
-    block_distribution = molfs_dev.encode_file(test_file, encoded_dir, redundant_strategy)
-    
-    # Simulate failure of Pool 1, Block 1 by excluding it
-    # Get all files except Pool 1, Block 1
-    block_files = [info["file"] for (pool, block), info in block_distribution.items() 
-                  if not (pool == 1 and block == 1)]
-    
-    # Reconstruct with "damaged" Pool 1
-    reconstructed_file = os.path.join(test_dir, "reconstructed.bin")
-    success, file_info = molfs_dev.reconstruct_file(block_files, reconstructed_file)
-    
-    if not success:
-        print("❌ Reconstruction failed")
-        return False
+    # Create a scratch output directory, removed when the test finishes
+    with tempfile.TemporaryDirectory(prefix="redundant_test_", dir=TEST_ROOT) as test_dir:
+        # Create a test file (15KB - should be 3 blocks at 5KB each)
+        test_file = os.path.join(test_dir, "input.bin")
+        create_test_file(test_file, 15 * 1024)
+        
+        # Copy the session MolFS interface (5KB blocks, unique primers for different Pool/Block
+        # combinations). Block 1 will be in both Pool 1 and Pool 2
+        molfs_dev = copy.copy(configured_device)
+        
+        # Define a distribution strategy with redundancy for block 1:
+        # block 1 goes to both Pool 1 and Pool 2, other blocks just go to Pool 1
+        redundant_strategy = {0: (1,), 1: (1, 2), 2: (1,)}
+        
+        # Encode the file across pools, one worker process per block copy
+        encoded_dir = os.path.join(test_dir, "encoded")
+        block_distribution = molfs_dev.encode_file(test_file, encoded_dir, redundant_strategy, parallel=True)
+        
+        # Simulate failure of Pool 1, Block 1 by excluding it; pop without a default, so a
+        # missing redundant copy fails the test
+        block_distribution.pop((1, 1))
+        block_files = [info["file"] for info in block_distribution.values()]
+        
+        # Reconstruct with "damaged" Pool 1
+        reconstructed_file = os.path.join(test_dir, "reconstructed.bin")
+        success, file_info = molfs_dev.reconstruct_file(block_files, reconstructed_file)
+        
+        assert success, "Reconstruction failed"
+        
+        # Verify file integrity
+        assert verify_file_integrity(test_file, reconstructed_file)
+
+# Mocked free space per pool for weighted placement: a pool's chance of receiving a
+# replica is its share of the total free space (Pr[pool] = free / sum(free))
+POOL_FREE_SPACE = {1: 400, 2: 250, 3: 100}
+
+def weighted_strategy(block_idx, total_blocks, rng, replica_count=2):
+    """
+    Place a block on replica_count distinct pools, chosen with probability proportional to
+    POOL_FREE_SPACE. Sampling is without replacement: a chosen pool is removed before the
+    next draw. rng is a seeded random.Random so the placement is reproducible.
+    """
+    remaining = dict(POOL_FREE_SPACE)
+    pools = []
+    for _ in range(replica_count):
+        pool = rng.choices(list(remaining), weights=list(remaining.values()))[0]
+        pools.append(pool)
+        del remaining[pool]
+    return pools
+
+def test_weighted_placement(configured_device):
+    """Test redundant storage with pools chosen by free-space-weighted sampling."""
+    print("\n=== Testing Weighted Placement ===")
+    
+    # Create a scratch output directory, removed when the test finishes
+    with tempfile.TemporaryDirectory(prefix="weighted_test_", dir=TEST_ROOT) as test_dir:
+        # Create a test file (15KB - should be 3 blocks at 5KB each)
+        test_file = os.path.join(test_dir, "input.bin")
+        create_test_file(test_file, 15 * 1024)
+        
+        # Copy the session MolFS interface (5KB blocks); Pool/Block combinations without
+        # registered primers fall back to the default primer pair
+        molfs_dev = copy.copy(configured_device)
+        
+        # Two replicas per block on pools drawn by free space, from a fixed seed
+        strategy = functools.partial(weighted_strategy, rng=random.Random(24))
+        
+        # Encode the file across pools, one worker process per block copy
+        encoded_dir = os.path.join(test_dir, "encoded")
+        block_distribution = molfs_dev.encode_file(test_file, encoded_dir, strategy, parallel=True)
+        
+        # Every block must have landed on two distinct pools
+        for block_idx in range(3):
+            pools = [pool for pool, block in block_distribution if block == block_idx]
+            assert len(pools) == 2, f"Block {block_idx} placed on pools {pools}, expected 2 distinct pools"
+        
+        # Simulate failure of the pool with the most free space (the likeliest target);
+        # each block still has its other replica
+        failed_pool = max(POOL_FREE_SPACE, key=POOL_FREE_SPACE.get)
+        block_files = [info["file"] for (pool, _), info in block_distribution.items()
+                       if pool != failed_pool]
+        
+        # Reconstruct without the failed pool
+        reconstructed_file = os.path.join(test_dir, "reconstructed.bin")
+        success, file_info = molfs_dev.reconstruct_file(block_files, reconstructed_file)
+        
+        assert success, "Reconstruction failed"
+        
+        # Verify file integrity
+        assert verify_file_integrity(test_file, reconstructed_file)
+
+def xor_bytes(a, b):
+    """XOR two equal-length byte strings (one big-integer XOR, done in C)."""
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(len(a), 'big')
+
+def test_erasure_coded_storage(configured_device):
+    """Test erasure-coded storage: k data shards plus one XOR parity shard across pools."""
+    print("\n=== Testing Erasure-Coded Storage ===")
+    
+    # Create a scratch output directory, removed when the test finishes
+    with tempfile.TemporaryDirectory(prefix="erasure_test_", dir=TEST_ROOT) as test_dir:
+        # Encode a 5KB test file into one pool's CSV, hashing the data on the way in
+        test_file = os.path.join(test_dir, "input.bin")
+        create_test_file(test_file, 5 * 1024)
+        molfs_dev = copy.copy(configured_device)
+        encoded_file = os.path.join(test_dir, "encoded.csv")
+        success, _, encoded_digest = molfs_dev.encode(test_file, encoded_file, return_digest=True)
+        assert success, "Encoding failed"
+        
+        with open(encoded_file, 'rb') as f:
+            encoded = f.read()
+        
+        # Split the CSV into k equal data shards and add one parity shard, so any single
+        # lost shard can be rebuilt for 1/k storage overhead (replication needs a full copy);
+        # shard i is stored in pool i + 1
+        k = 4
+        shard_size = (len(encoded) + k - 1) // k
+        padded = encoded.ljust(k * shard_size, b'\0')
+        shards = {i + 1: padded[i * shard_size:(i + 1) * shard_size] for i in range(k)}
+        parity = bytes(shard_size)
+        for shard in shards.values():
+            parity = xor_bytes(parity, shard)
+        shards[k + 1] = parity
+        
+        # Simulate failure of Pool 3 and rebuild its shard from the k survivors
+        lost = 3
+        del shards[lost]
+        rebuilt = bytes(shard_size)
+        for shard in shards.values():
+            rebuilt = xor_bytes(rebuilt, shard)
+        shards[lost] = rebuilt
+        
+        # Reassemble the CSV from the data shards, trim the padding and decode it
+        recovered_file = os.path.join(test_dir, "recovered.csv")
+        with open(recovered_file, 'wb') as f:
+            f.write(b''.join(shards[pool] for pool in range(1, k + 1))[:len(encoded)])
+        
+        decoded_file = os.path.join(test_dir, "decoded.bin")
+        success, block_info, decoded_digest = molfs_dev.decode(recovered_file, decoded_file, return_digest=True)
+        assert success, "Decoding failed"
+        
+        # Verify file integrity from the digests taken during encode and decode
+        assert verify_digests(encoded_digest, decoded_digest)
+
+def test_parallel_encode_decode():
+    """Test that encoding and decoding with worker processes matches the single-process path."""
+    print("\n=== Testing Parallel Encode/Decode ===")
+    
+    forward_primer, reverse_primer = PRIMERS[(1, 0)]
+    # 64KB - about 5.5k oligos, so the decoder splits the records into several shards
+    data = random.Random(12).randbytes(64 * 1024)
+    
+    with tempfile.TemporaryDirectory(prefix="parallel_test_", dir=TEST_ROOT) as test_dir:
+        outputs = {}
+        for max_workers in (1, 2):
+            encoded_file = os.path.join(test_dir, f"encoded_{max_workers}.csv")
+            num_oligos, _, _ = encode_bytes_to_dna(data, encoded_file, forward_primer, reverse_primer,
+                                                   max_workers=max_workers)
+            assert num_oligos > SHARD_SIZE
+            
+            decoded_file = os.path.join(test_dir, f"decoded_{max_workers}.bin")
+            decode_oligos_from_csv(encoded_file, forward_primer, reverse_primer, decoded_file,
+                                   max_workers=max_workers)
+            # Bases are drawn at random per bit, so compare the CSV on its block, address,
+            # data and CRC32 columns only
+            with open(encoded_file, 'r') as f, open(decoded_file, 'rb') as g:
+                outputs[max_workers] = ([line.split(',', 4)[:4] for line in f], g.read())
+    
+    # Same oligo contents and same decoded bytes either way, and the data survives the round trip
+    assert outputs[2] == outputs[1]
+    assert outputs[1][1][:len(data)] == data
+
+def test_fastq_damaged_first_primer():
+    """Test that a damaged primer in the first read does not misalign the later reads."""
+    print("\n=== Testing FASTQ With a Damaged First Primer ===")
+    
+    forward_primer, reverse_primer = PRIMERS[(1, 0)]
+    oligos = [oligo for _, _, _, oligo in bytes_to_dna_with_crc32(bytes(range(256)) * 2, forward_primer, reverse_primer)]
+    
+    # One substituted base in the first read's forward primer
+    damaged = "C" if oligos[0][5] == "A" else "A"
+    oligos[0] = oligos[0][:5] + damaged + oligos[0][6:]
+    
+    with tempfile.TemporaryDirectory(prefix="fastq_test_", dir=TEST_ROOT) as test_dir:
+        fastq_file = os.path.join(test_dir, "reads.fastq")
+        with open(fastq_file, 'w') as f:
+            for read_num, oligo in enumerate(oligos, 1):
+                f.write(f"@read{read_num}\n{oligo}\n+\n{'I' * len(oligo)}\n")
+        
+        decoded_blocks, block_info = decode_oligos_from_fastq(fastq_file, forward_primer, reverse_primer)
     
-    # Verify file integrity
-    return verify_file_integrity(test_file, reconstructed_file)
-
-def run_all_tests():
-    """Run all tests and report results."""
-    # Create base directory if it doesn't exist
-    os.makedirs(BASE_PATH, exist_ok=True)
-    
-    tests = [
-        ("Basic Functionality", test_basic_functionality),
-        ("Multi-Block", test_multi_block),
-        ("Redundant Storage", test_redundant_storage)
-    ]
-    
-    results = {}
-    
-    print("=== Church Algorithm Implementation Test Suite ===")
-    print(f"Using base path: {BASE_PATH}")
-    print(f"Running {len(tests)} tests...\n")
-    
-    for name, test_func in tests:
-        print(f"\n{'=' * 50}")
-        print(f"Running test: {name}")
-        print(f"{'=' * 50}")
-        
-        try:
-            result = test_func()
-            results[name] = result
-        except Exception as e:
-            print(f"❌ Test '{name}' raised an exception: {e}")
-            results[name] = False
-    
-    # Print summary
-    print("\n\n=== Test Results Summary ===")
-    all_passed = True
-    for name, result in results.items():
-        status = "✅ PASSED" if result else "❌ FAILED"
-        print(f"{status} - {name}")
-        if not result:
-            all_passed = False
-    
-    return all_passed
-
-if __name__ == "__main__":
-    success = run_all_tests()
-    
-    if success:
-        print("\n🎉 All tests passed! The implementation is working correctly.")
-        sys.exit(0)
-    else:
-        print("\n❌ Some tests failed. Please check the logs above for details.")
-        sys.exit(1)
+    # Only the damaged read is lost
+    assert len(decoded_blocks) == len(oligos) - 1
+    assert block_info["crc_stats"]["invalid"] == 1
+
+def substitute_base(sequence, index):
+    """Return sequence with the base at index replaced by a different one."""
+    return sequence[:index] + ("C" if sequence[index] == "A" else "A") + sequence[index + 1:]
+
+def test_pack_bases():
+    """Test 2-bit primer packing and the packed mismatch count."""
+    packed, mask = _pack_bases("ACGT")
+    assert packed == 0b00011011 and mask == 0b01010101
+    assert _pack_bases("ACNT") is None and _pack_bases("") is None
+    
+    other, _ = _pack_bases("ACCA")
+    assert _base_mismatches(packed, other, mask) == 2
+    assert _base_mismatches(packed, packed, mask) == 0
+
+def test_classify_sequence_sw(configured_device):
+    """Test Smith-Waterman classification of reads with errors in their primers."""
+    molfs_dev = copy.copy(configured_device)
+    forward_primer, reverse_primer = PRIMERS[(1, 2)]
+    oligo = bytes_to_dna_with_crc32(b"classify me!", forward_primer, reverse_primer)[0][3]
+    core = oligo[len(forward_primer):-len(reverse_primer)]
+    
+    # Exact primers
+    assert molfs_dev.ClassifySequence_SW(forward_primer + core + reverse_primer) == (1, 2, core)
+    
+    # Forward primer substitutions: one scored from packed codes, one in the anchor bases
+    # that must go through the full alignment
+    for index in (5, 20):
+        read = substitute_base(forward_primer, index) + core + reverse_primer
+        assert molfs_dev.ClassifySequence_SW(read) == (1, 2, core)
+    
+    # Forward primer insertion and deletion
+    inserted = forward_primer[:8] + "T" + forward_primer[8:]
+    deleted = forward_primer[:8] + forward_primer[9:]
+    for damaged in (inserted, deleted):
+        assert molfs_dev.ClassifySequence_SW(damaged + core + reverse_primer) == (1, 2, core)
+    
+    # Reverse primer error, behind an exact and behind a damaged forward primer
+    damaged_reverse = substitute_base(reverse_primer, 10)
+    assert molfs_dev.ClassifySequence_SW(forward_primer + core + damaged_reverse) == (1, 2, core)
+    assert molfs_dev.ClassifySequence_SW(deleted + core + damaged_reverse) == (1, 2, core)
+    
+    # No primer anywhere
+    noise = "T" * len(oligo)
+    assert molfs_dev.ClassifySequence_SW(noise) == (-1, -1, noise)
+
+def test_classify_sequence_sw_tie():
+    """Test that the earliest registered primer wins when two score the same."""
+    forward_a, reverse_primer = PRIMERS[(1, 0)]
+    forward_b = substitute_base(forward_a, 9)
+    core = "ACGT" * 30
+    
+    # A third base at position 9 is one substitution from both primers; a second
+    # substitution in the anchor bases sends the read through the full alignment
+    read_primer = forward_a[:9] + "T" + forward_a[10:]
+    for damaged in (read_primer, substitute_base(read_primer, 20)):
+        for registered in (((5, 0), forward_a), ((6, 0), forward_b)), (((6, 0), forward_b), ((5, 0), forward_a)):
+            molfs_dev = MolFSDev()
+            for (pool, block), forward_primer in registered:
+                molfs_dev.register_primers(pool, block, forward_primer, reverse_primer)
+            assert molfs_dev.ClassifySequence_SW(damaged + core + reverse_primer) == registered[0][0] + (core,)